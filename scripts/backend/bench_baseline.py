@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Benchmark baseline store and regression comparator
+Records named benchmark runs (any JSON with a 'results' mapping of case name to
+per-repeat samples, as written by --json on every benchmark in this directory and
+on load_harness.py) together with the
+environment they ran in, and compares a new run against a stored baseline. Each
+case is tested with a one-sided Mann-Whitney U test on the repeat samples, and a
+case regresses only if it is both significantly slower and slower by more than
+the threshold, so single noisy numbers don't fail the check.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_STORE = Path(__file__).resolve().parent / 'baselines'
+
+# Sample keys understood per case, in order of preference (lower is better for all of them)
+SAMPLE_KEYS = ('samplesNsPerOp', 'samplesMs', 'samples')
+
+# Above this many sample pairs the exact U distribution is replaced by the normal approximation
+EXACT_U_MAX_PAIRS = 400
+
+def environment_metadata():
+    """Describe the machine and code the baseline was recorded on"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpuCount': os.cpu_count(),
+        'commit': commit
+    }
+
+def run_record(suite, unit, settings, results):
+    """Benchmark run in the shape record and compare read; results maps case name to samples"""
+    return {
+        'suite': suite,
+        'unit': unit,
+        'environment': {**environment_metadata(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())},
+        'settings': settings,
+        'results': results
+    }
+
+def load_samples(run):
+    """Return {case: [samples]} from a benchmark run"""
+    samples = {}
+    for name, result in run.get('results', {}).items():
+        key = next((key for key in SAMPLE_KEYS if key in result), None)
+        if key is not None and result[key]:
+            samples[name] = [float(value) for value in result[key]]
+    return samples
+
+@lru_cache(maxsize=None)
+def u_frequencies(m, n):
+    """Number of orderings of m and n samples giving each U statistic (U counts pairs with x > y)"""
+    if m == 0 or n == 0:
+        return (1,)
+    # The largest sample comes from x (adding n to U) or from y (adding nothing)
+    from_x = u_frequencies(m - 1, n)
+    from_y = u_frequencies(m, n - 1)
+    frequencies = [0] * (m * n + 1)
+    for u, count in enumerate(from_x):
+        frequencies[u + n] += count
+    for u, count in enumerate(from_y):
+        frequencies[u] += count
+    return tuple(frequencies)
+
+def mann_whitney_greater(x, y):
+    """One-sided Mann-Whitney U test that x tends to be larger than y; returns (U, p-value)"""
+    m, n = len(x), len(y)
+    u = sum(1.0 if a > b else 0.5 if a == b else 0.0 for a in x for b in y)
+    if m * n <= EXACT_U_MAX_PAIRS:
+        frequencies = u_frequencies(m, n)
+        at_least = sum(frequencies[math.ceil(u):])
+        return u, at_least / sum(frequencies)
+    # Normal approximation with tie correction and continuity correction
+    ranked = sorted(x + y)
+    tie_term = 0
+    index = 0
+    while index < len(ranked):
+        run = 1
+        while index + run < len(ranked) and ranked[index + run] == ranked[index]:
+            run += 1
+        tie_term += run ** 3 - run
+        index += run
+    total = m + n
+    sigma = math.sqrt(m * n / 12 * ((total + 1) - tie_term / (total * (total - 1))))
+    if sigma == 0:
+        return u, 1.0
+    z = (u - m * n / 2 - 0.5) / sigma
+    return u, 0.5 * math.erfc(z / math.sqrt(2))
+
+def compare_runs(baseline, current, threshold, alpha):
+    """Compare per-case samples; returns rows of (case, baseline median, current median, change, p-value, verdict)"""
+    rows = []
+    for name in sorted(set(baseline) | set(current)):
+        if name not in current:
+            rows.append((name, statistics.median(baseline[name]), None, None, None, 'missing'))
+            continue
+        if name not in baseline:
+            rows.append((name, None, statistics.median(current[name]), None, None, 'new'))
+            continue
+        before, after = statistics.median(baseline[name]), statistics.median(current[name])
+        change = after / before - 1 if before else 0.0
+        _, p_slower = mann_whitney_greater(current[name], baseline[name])
+        _, p_faster = mann_whitney_greater(baseline[name], current[name])
+        if p_slower < alpha and change > threshold:
+            verdict = 'regression'
+        elif p_faster < alpha and change < -threshold:
+            verdict = 'improvement'
+        else:
+            verdict = 'unchanged'
+        rows.append((name, before, after, change, min(p_slower, p_faster), verdict))
+    return rows
+
+def baseline_path(store, name):
+    return store / f"{name}.json"
+
+def command_record(args):
+    run = json.loads(args.input.read_text())
+    if not load_samples(run):
+        sys.exit(f"❌ {args.input} has no per-case samples (expected one of {', '.join(SAMPLE_KEYS)} under 'results')")
+    args.store.mkdir(parents=True, exist_ok=True)
+    path = baseline_path(args.store, args.name)
+    path.write_text(json.dumps({
+        'name': args.name,
+        'recordedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': run.get('environment') or environment_metadata(),
+        'run': run
+    }, indent=2))
+    print(f"✅ Recorded baseline '{args.name}' ({len(load_samples(run))} cases) at {path}")
+
+def command_list(args):
+    paths = sorted(args.store.glob('*.json')) if args.store.is_dir() else []
+    if not paths:
+        print(f"No baselines in {args.store}")
+        return
+    for path in paths:
+        baseline = json.loads(path.read_text())
+        environment = baseline.get('environment', {})
+        print(
+            f"{baseline['name']:>24}  {baseline['recordedAt']}  {len(load_samples(baseline['run'])):>3} cases  "
+            f"commit {environment.get('commit') or '?'}  Python {environment.get('python', '?')} on {environment.get('machine', '?')}"
+        )
+
+def command_compare(args):
+    path = baseline_path(args.store, args.name)
+    if not path.exists():
+        sys.exit(f"❌ No baseline '{args.name}' in {args.store}")
+    baseline = json.loads(path.read_text())
+    run = json.loads(args.input.read_text())
+
+    # Timings only compare meaningfully on the same interpreter and hardware
+    baseline_environment = baseline.get('environment', {})
+    current_environment = run.get('environment') or environment_metadata()
+    for key in ('python', 'implementation', 'machine', 'cpuCount'):
+        if baseline_environment.get(key) != current_environment.get(key):
+            print(f"⚠️  {key} differs: baseline {baseline_environment.get(key)} vs current {current_environment.get(key)}")
+
+    rows = compare_runs(load_samples(baseline['run']), load_samples(run), args.threshold / 100, args.alpha)
+    print(f"{'case':>36} │ {'baseline':>12} │ {'current':>12} │ {'change':>8} │ {'p-value':>8} │ verdict")
+    print('─' * 37 + '┼' + '┼'.join('─' * width for width in (14, 14, 10, 10)) + '┼' + '─' * 12)
+    icons = {'regression': '❌', 'improvement': '🚀', 'unchanged': '  ', 'missing': '⚠️ ', 'new': '🆕'}
+    for name, before, after, change, p_value, verdict in rows:
+        print(
+            f"{name:>36} │ {before if before is not None else float('nan'):>12.1f} │ "
+            f"{after if after is not None else float('nan'):>12.1f} │ "
+            f"{(f'{change:+.1%}' if change is not None else '-'):>8} │ "
+            f"{(f'{p_value:.4f}' if p_value is not None else '-'):>8} │ {icons[verdict]} {verdict}"
+        )
+
+    regressions = [row[0] for row in rows if row[5] == 'regression']
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:g}% at alpha {args.alpha:g}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\n✅ No regressions beyond {args.threshold:g}% at alpha {args.alpha:g}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Record benchmark baselines and compare runs against them')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE, help='Directory holding baseline files')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    record = subcommands.add_parser('record', help='Store a benchmark run as a named baseline')
+    record.add_argument('name', help='Baseline name')
+    record.add_argument('--input', type=Path, required=True, help='Benchmark JSON to record')
+    record.set_defaults(func=command_record)
+
+    listing = subcommands.add_parser('list', help='List stored baselines')
+    listing.set_defaults(func=command_list)
+
+    compare = subcommands.add_parser('compare', help='Compare a benchmark run against a baseline')
+    compare.add_argument('name', help='Baseline name')
+    compare.add_argument('--input', type=Path, required=True, help='Benchmark JSON to compare')
+    compare.add_argument('--threshold', type=float, default=5.0, help='Minimum slowdown in percent to flag')
+    compare.add_argument('--alpha', type=float, default=0.01, help='Significance level of the Mann-Whitney U test')
+    compare.set_defaults(func=command_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
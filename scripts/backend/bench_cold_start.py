@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for api_lambda.py
+Starts a fresh interpreter per run and measures the time to import the handler
+module and to serve the first response with the production table settings,
+for the bot-path routes that should never load boto3. Optionally enforces an import-time budget.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / 'source' / 'backend'
+
+from bench_baseline import run_record  # noqa: E402
+
+# Tables the deployed function is configured with (terraform/main.tf), so the fleet
+# counter and sticky verdicts are enabled as in production; the environment overrides them
+PRODUCTION_ENV = {'DYNAMODB_TABLE_NAME': 'bench-comments', 'COUNTER_TABLE_NAME': 'bench-client-counters'}
+
+# Client IP plus the CloudFront hop, as the ALB forwards it, so fingerprints and verdicts are recorded
+BOT_HEADERS = {'user-agent': 'python-requests/2.31.0', 'host': 'example.com', 'x-forwarded-for': '203.0.113.7, 198.51.100.1'}
+
+SCENARIOS = {
+    'bot-comments': {'httpMethod': 'GET', 'path': '/api/comments'},
+    'bot-flights': {'httpMethod': 'GET', 'path': '/api/pricing-demo-3/flights'},
+    'bot-robots': {'httpMethod': 'GET', 'path': '/robots.txt'},
+    'status': {'httpMethod': 'GET', 'path': '/api/status'},
+    'health': {'httpMethod': 'GET', 'path': '/health'},
+}
+
+# Runs inside the child interpreter; prints one JSON line with the timings
+CHILD_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import api_lambda
+imported = time.perf_counter()
+response = api_lambda.lambda_handler(json.loads(sys.argv[1]), None)
+responded = time.perf_counter()
+print('BENCH ' + json.dumps({
+    'importMs': (imported - started) * 1000,
+    'firstResponseMs': (responded - imported) * 1000,
+    'totalMs': (responded - started) * 1000,
+    'status': response.get('statusCode'),
+    'boto3Loaded': 'boto3' in sys.modules
+}))
+'''
+
+def run_once(event):
+    """Run one cold start in a fresh interpreter and return its timings"""
+    env = {**PRODUCTION_ENV, **os.environ, 'LOG_SAMPLE_RATES': 'human=0,bot=0,none=0', 'PYTHONDONTWRITEBYTECODE': '1'}
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, json.dumps(event)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    line = next(line for line in output.splitlines() if line.startswith('BENCH '))
+    return json.loads(line[len('BENCH '):])
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure api_lambda import-to-first-response time')
+    parser.add_argument('--runs', type=int, default=10, help='Cold starts per scenario')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS), help='Scenarios to run')
+    parser.add_argument('--budget-ms', type=float, default=None, help='Fail if the median import time exceeds this budget')
+    parser.add_argument('--json', type=Path, help='Write per-run samples to this path for bench_baseline.py')
+    args = parser.parse_args()
+
+    print(f"{'scenario':>13} │ {'import p50':>10} │ {'import p95':>10} │ {'first resp':>10} │ {'total p50':>10} │ boto3")
+    print('─' * 14 + '┼' + '┼'.join('─' * 12 for _ in range(4)) + '┼' + '─' * 6)
+
+    import_medians = []
+    samples = {}
+    failed = False
+    for name in args.scenarios:
+        event = {'requestContext': {'elb': {'targetGroupArn': 'bench'}}, 'headers': BOT_HEADERS, **SCENARIOS[name]}
+        results = [run_once(event) for _ in range(args.runs)]
+        import_times = [result['importMs'] for result in results]
+        samples[f"cold_start[{name}-import]"] = {'samplesMs': import_times}
+        samples[f"cold_start[{name}-total]"] = {'samplesMs': [result['totalMs'] for result in results]}
+        import_medians.append(statistics.median(import_times))
+        boto3_loaded = any(result['boto3Loaded'] for result in results)
+        failed = failed or boto3_loaded
+        print(
+            f"{name:>13} │ {statistics.median(import_times):>7.2f} ms │ {percentile(import_times, 0.95):>7.2f} ms │ "
+            f"{statistics.median(result['firstResponseMs'] for result in results):>7.2f} ms │ "
+            f"{statistics.median(result['totalMs'] for result in results):>7.2f} ms │ {'yes ❌' if boto3_loaded else 'no'}"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(run_record('api_lambda.cold_start', 'ms', {'runs': args.runs}, samples), indent=2))
+        print(f"📝 Results written to {args.json}")
+    if failed:
+        print('❌ boto3 was loaded on a path that should not touch DynamoDB')
+    if args.budget_ms is not None:
+        worst = max(import_medians)
+        if worst > args.budget_ms:
+            print(f"❌ Median import time {worst:.2f} ms exceeds the {args.budget_ms:.2f} ms budget")
+            failed = True
+        else:
+            print(f"✅ Median import time {worst:.2f} ms is within the {args.budget_ms:.2f} ms budget")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark for GET /api/pricing-demo-3/flights in api_lambda.py
+Compares the legacy per-request path (rebuild catalog, price, json.dumps through
+DecimalEncoder) against the prebuilt per-variant response bodies
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'source' / 'backend'))
+
+from bench_baseline import run_record  # noqa: E402
+
+from api_lambda import (  # noqa: E402
+    FLIGHT_CATALOG, DecimalEncoder, get_flight_bodies, send_response, send_serialized_response
+)
+
+def legacy_flights_response(is_bot):
+    """The original handler body: rebuild, price and serialize on every call"""
+    base_flights = [dict(flight) for flight in FLIGHT_CATALOG]  # Stands in for the per-call list literal
+    flights = []
+    for flight in base_flights:
+        if is_bot:
+            processed_flight = {**flight, 'price': flight['originalPrice'], 'discount': 0, 'available': True}
+        else:
+            discounted_price = int(flight['originalPrice'] * (100 - flight['baseDiscount']) / 100)
+            processed_flight = {**flight, 'price': discounted_price, 'discount': flight['baseDiscount'], 'available': True}
+        flights.append(processed_flight)
+    return send_response(200, {
+        'flights': flights,
+        'total': len(flights),
+        'message': 'Flight data retrieved successfully'
+    })
+
+def prebuilt_flights_response(is_bot):
+    """The current handler body: select a prebuilt string"""
+    return send_serialized_response(200, get_flight_bodies()['bot' if is_bot else 'human'])
+
+def time_per_call(func, is_bot, number, repeat):
+    """Return the mean cost of one call in nanoseconds for every repeat"""
+    func(is_bot)
+    return [elapsed / number * 1e9 for elapsed in timeit.repeat(lambda: func(is_bot), number=number, repeat=repeat)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the flights response path')
+    parser.add_argument('--number', type=int, default=20000, help='Iterations per timing run')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing runs per path')
+    parser.add_argument('--json', type=Path, help='Write per-repeat samples to this path for bench_baseline.py')
+    args = parser.parse_args()
+
+    # Both paths must produce byte-identical bodies
+    for is_bot in (True, False):
+        assert legacy_flights_response(is_bot)['body'] == prebuilt_flights_response(is_bot)['body']
+
+    print(f"{'variant':>8} │ {'legacy':>12} │ {'prebuilt':>12} │ {'speedup':>8}")
+    print('─' * 9 + '┼' + '─' * 14 + '┼' + '─' * 14 + '┼' + '─' * 9)
+    results = {}
+    for variant, is_bot in (('bot', True), ('human', False)):
+        legacy = time_per_call(legacy_flights_response, is_bot, args.number, args.repeat)
+        prebuilt = time_per_call(prebuilt_flights_response, is_bot, args.number, args.repeat)
+        results[f"flights[{variant}-legacy]"] = {'samplesNsPerOp': legacy}
+        results[f"flights[{variant}-prebuilt]"] = {'samplesNsPerOp': prebuilt}
+        legacy, prebuilt = min(legacy) / 1000, min(prebuilt) / 1000
+        print(f"{variant:>8} │ {legacy:>9.3f} µs │ {prebuilt:>9.3f} µs │ {legacy / prebuilt:>7.1f}x")
+
+    if args.json:
+        settings = {'number': args.number, 'repeat': args.repeat}
+        args.json.write_text(json.dumps(run_record('api_lambda.flights', 'nsPerOp', settings, results), indent=2))
+        print(f"📝 Results written to {args.json}")
+
+if __name__ == '__main__':
+    main()
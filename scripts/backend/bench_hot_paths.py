@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark suite for the hot functions in api_lambda.py
+Every case runs on fixed inputs after a warmup, and is timed over several repeats
+(ns/op and ops/sec from the best repeat, with every repeat kept as a sample).
+Allocation cost is reported as the tracemalloc peak per call (transient bytes)
+and the net allocated blocks per call (retained objects). Results can be written
+as JSON for bench_baseline.py to record and compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+from decimal import Decimal
+from pathlib import Path
+
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('LOG_SAMPLE_RATES', 'human=0,bot=0,none=0')
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / 'source' / 'backend'))
+
+import api_lambda  # noqa: E402
+
+HUMAN_HEADERS = {
+    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'accept': 'text/html,application/xhtml+xml',
+    'accept-language': 'en-US,en;q=0.9',
+    'x-forwarded-for': '203.0.113.7'
+}
+BOT_HEADERS = {'user-agent': 'python-requests/2.31.0', 'accept': '*/*', 'x-forwarded-for': '198.51.100.9'}
+WAF_HEADERS = {**HUMAN_HEADERS, 'x-amzn-waf-targeted-bot-detected': 'true'}
+
+JSON_BODY = json.dumps({'name': 'Jane Doe', 'comment': 'Lovely hotel, friendly staff and a great breakfast.', 'rating': 5})
+FORM_BODY = 'name=Jane+Doe&comment=Lovely+hotel%2C+friendly+staff+and+a+great+breakfast.&rating=5'
+MALFORMED_BODY = '{"name": "Jane Doe", "comment": '
+
+# DynamoDB returns numbers as Decimal; half the page is in the legacy duplicated schema
+STORED_COMMENTS = [
+    {
+        'id': f"17000000{index:05d}_abcdefghi",
+        'feed_bucket': 'comments#0',
+        'timestamp': Decimal(1700000000000 + index),
+        'n': f"Guest {index}",
+        'c': 'Lovely hotel, friendly staff and a great breakfast. ' * 3,
+        'r': Decimal(index % 5 + 1)
+    } if index % 2 else {
+        'id': f"17000000{index:05d}_abcdefghi",
+        'feed_bucket': 'comments#0',
+        'timestamp': Decimal(1700000000000 + index),
+        'name': f"Guest {index}",
+        'comment': 'Lovely hotel, friendly staff and a great breakfast. ' * 3,
+        'rating': Decimal(index % 5 + 1),
+        'silent_discard': False
+    }
+    for index in range(50)
+]
+COMMENTS_BODY = {
+    'comments': [api_lambda.comment_from_item(comment) for comment in STORED_COMMENTS],
+    'total': len(STORED_COMMENTS),
+    'nextCursor': None,
+    'message': 'Comments retrieved successfully'
+}
+
+def transform_comments():
+    """The per-item reshaping loop in handle_get_comments"""
+    return [api_lambda.comment_from_item(comment) for comment in STORED_COMMENTS]
+
+FAKE_COMMENT_RNG = random.Random(1)
+
+# A human comments read as the ALB delivers it, through routing, classification and serialization
+ALB_GET_COMMENTS_EVENT = {
+    'requestContext': {'elb': {'targetGroupArn': 'arn:aws:elasticloadbalancing:us-east-1:000000000000:targetgroup/bench/0'}},
+    'httpMethod': 'GET',
+    'path': '/api/comments',
+    'queryStringParameters': {'limit': '20'},
+    'headers': {**HUMAN_HEADERS, 'sec-fetch-mode': 'cors', 'host': 'bench.example.com'},
+    'body': None,
+    'isBase64Encoded': False
+}
+api_lambda.db.put_items([dict(comment) for comment in STORED_COMMENTS])
+
+CASES = {
+    'is_bot_request[human]': lambda: api_lambda.is_bot_request(HUMAN_HEADERS),
+    'is_bot_request[bot-ua]': lambda: api_lambda.is_bot_request(BOT_HEADERS),
+    'is_bot_request[waf]': lambda: api_lambda.is_bot_request(WAF_HEADERS),
+    'parse_body[json]': lambda: api_lambda.parse_body(JSON_BODY, 'application/json'),
+    'parse_body[form]': lambda: api_lambda.parse_body(FORM_BODY, 'application/x-www-form-urlencoded'),
+    'parse_body[fallback-json]': lambda: api_lambda.parse_body(JSON_BODY, None),
+    'parse_body[fallback-malformed]': lambda: api_lambda.parse_body(MALFORMED_BODY, None),
+    'send_response[comments-page]': lambda: api_lambda.send_response(200, COMMENTS_BODY),
+    'send_response[small]': lambda: api_lambda.send_response(404, {'error': 'Route not found', 'rating': Decimal(5)}),
+    'generate_fake_comment': lambda: api_lambda.generate_fake_comment(FAKE_COMMENT_RNG, 1700000000000),
+    'generate_random_id': api_lambda.generate_random_id,
+    'comment_transform[50]': transform_comments,
+    'lambda_handler[alb-get-comments]': lambda: api_lambda.lambda_handler(ALB_GET_COMMENTS_EVENT, None),
+}
+
+def measure(func, number, repeat, warmup):
+    """Time one case and measure its allocations"""
+    for _ in range(warmup):
+        func()
+    samples = [elapsed / number * 1e9 for elapsed in timeit.repeat(func, number=number, repeat=repeat)]
+
+    blocks_before = sys.getallocatedblocks()
+    for _ in range(number):
+        func()
+    retained_blocks = (sys.getallocatedblocks() - blocks_before) / number
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(samples)
+    return {
+        'nsPerOp': best,
+        'opsPerSec': 1e9 / best,
+        'samplesNsPerOp': samples,
+        'peakBytesPerCall': peak - baseline,
+        'retainedBlocksPerCall': retained_blocks
+    }
+
+def environment_metadata():
+    """Describe where and on what code the run happened"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpuCount': os.cpu_count(),
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the api_lambda hot functions')
+    parser.add_argument('--number', type=int, default=10000, help='Calls per timing repeat')
+    parser.add_argument('--repeat', type=int, default=7, help='Timing repeats per case')
+    parser.add_argument('--warmup', type=int, default=1000, help='Untimed calls before measuring')
+    parser.add_argument('--filter', default='', help='Only run cases whose name contains this string')
+    parser.add_argument('--json', type=Path, help='Write machine-readable results to this path')
+    args = parser.parse_args()
+
+    api_lambda.request_log.start('GET', '/bench', '203.0.113.7', HUMAN_HEADERS['user-agent'])
+    sys.stdout.flush()
+
+    results = {}
+    print(f"{'case':>34} │ {'ns/op':>10} │ {'ops/sec':>12} │ {'peak B/call':>11} │ {'blocks/call':>11}")
+    print('─' * 35 + '┼' + '┼'.join('─' * width for width in (12, 14, 13, 13)))
+    for name, func in CASES.items():
+        if args.filter not in name:
+            continue
+        result = measure(func, args.number, args.repeat, args.warmup)
+        results[name] = result
+        print(
+            f"{name:>34} │ {result['nsPerOp']:>10.1f} │ {result['opsPerSec']:>12,.0f} │ "
+            f"{result['peakBytesPerCall']:>11} │ {result['retainedBlocksPerCall']:>11.2f}"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps({
+            'suite': 'api_lambda.hot_paths',
+            'unit': 'nsPerOp',
+            'environment': environment_metadata(),
+            'settings': {'number': args.number, 'repeat': args.repeat, 'warmup': args.warmup},
+            'results': results
+        }, indent=2))
+        print(f"📝 Results written to {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the hosting IP range trie in api_lambda.py
+Builds a trie from generated (or real) CIDR ranges, well past 100k prefixes by
+default, and measures insert time, serialized size, load time from the
+serialized form, and lookup cost for IPv4 and IPv6 hits and misses. Every
+lookup in the sample is checked against a per-prefix-length hash lookup.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import time
+import timeit
+from pathlib import Path
+
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'source' / 'backend'))
+
+from api_lambda import IPRangeTrie, iter_ip_ranges, parse_ip_address  # noqa: E402
+from bench_baseline import run_record  # noqa: E402
+
+def format_address(value, width):
+    family = socket.AF_INET if width == 32 else socket.AF_INET6
+    return socket.inet_ntop(family, value.to_bytes(width // 8, 'big'))
+
+def generate_ranges(count, ipv6_share, rng):
+    """Random (cidr, label) ranges: IPv4 /12-/28 and IPv6 /24-/64, nested ranges included"""
+    ranges = []
+    for index in range(count):
+        width, length = (128, rng.randint(24, 64)) if rng.random() < ipv6_share else (32, rng.randint(12, 28))
+        network = rng.getrandbits(length) << (width - length)
+        ranges.append((f"{format_address(network, width)}/{length}", f"provider-{index % 50}:region-{index % 17}"))
+    return ranges
+
+def reference_index(ranges):
+    """{width: {length: {prefix key: label}}}, later duplicates winning like the trie"""
+    index = {32: {}, 128: {}}
+    for cidr, label in ranges:
+        address, _, length = cidr.partition('/')
+        value, width = parse_ip_address(address)
+        index[width].setdefault(int(length), {})[value >> (width - int(length))] = label
+    return index
+
+def reference_lookup(index, address):
+    value, width = parse_ip_address(address)
+    for length in sorted(index[width], reverse=True):
+        label = index[width][length].get(value >> (width - length))
+        if label is not None:
+            return label
+    return None
+
+def sample_addresses(ranges, count, rng):
+    """Addresses inside random ranges (hits) and uniformly random addresses (mostly misses)"""
+    hits, misses = {32: [], 128: []}, {32: [], 128: []}
+    for _ in range(count):
+        address, _, length = rng.choice(ranges)[0].partition('/')
+        value, width = parse_ip_address(address)
+        hits[width].append(format_address(value | rng.getrandbits(width - int(length)), width))
+    for width in (32, 128):
+        misses[width] = [format_address(rng.getrandbits(width), width) for _ in range(count)]
+    return hits, misses
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the IP range trie')
+    parser.add_argument('--prefixes', type=int, default=150000, help='Generated ranges')
+    parser.add_argument('--ipv6-share', type=float, default=0.3, help='Fraction of generated ranges that are IPv6')
+    parser.add_argument('--source', type=Path, help='Benchmark a real ranges JSON instead of generated ranges')
+    parser.add_argument('--lookups', type=int, default=2000, help='Addresses sampled per lookup case')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repeats per lookup case')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    parser.add_argument('--json', type=Path, help='Write per-repeat samples to this path for bench_baseline.py')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.source:
+        ranges = list(iter_ip_ranges(json.loads(args.source.read_text())))
+    else:
+        ranges = generate_ranges(args.prefixes, args.ipv6_share, rng)
+
+    started = time.perf_counter()
+    trie = IPRangeTrie.from_ranges(ranges)
+    build_s = time.perf_counter() - started
+    data = trie.to_bytes()
+    load_times = timeit.repeat(lambda: IPRangeTrie.from_bytes(data), number=1, repeat=3)
+    results = {'ip_ranges[load]': {'samplesMs': [elapsed * 1000 for elapsed in load_times]}}
+    loaded = IPRangeTrie.from_bytes(data)
+
+    print(f"🌳 {len(ranges)} ranges → {len(trie.tables[32][0]) - 1} IPv4 + {len(trie.tables[128][0]) - 1} IPv6 nodes")
+    print(f"   Build {build_s * 1000:.0f} ms ({build_s / len(ranges) * 1e6:.1f} µs/range), "
+          f"serialized {len(data) / 1024:.0f} KiB, load {min(load_times) * 1000:.0f} ms")
+
+    hits, misses = sample_addresses(ranges, args.lookups, rng)
+    index = reference_index(ranges)
+    mismatches = sum(
+        1 for group in (hits, misses) for addresses in group.values() for address in addresses
+        if loaded.lookup(address) != reference_lookup(index, address)
+    )
+
+    print(f"\n{'case':>12} │ {'addresses':>9} │ {'ns/lookup':>9} │ {'hit rate':>8}")
+    print('─' * 13 + '┼' + '┼'.join('─' * width for width in (11, 11, 10)))
+    for name, addresses in (('ipv4-hit', hits[32]), ('ipv4-miss', misses[32]), ('ipv6-hit', hits[128]), ('ipv6-miss', misses[128])):
+        if not addresses:
+            continue
+        samples = [
+            elapsed / len(addresses) * 1e9
+            for elapsed in timeit.repeat(lambda: [loaded.lookup(address) for address in addresses], number=1, repeat=args.repeat)
+        ]
+        results[f"ip_ranges[{name}]"] = {'samplesNsPerOp': samples}
+        hit_rate = sum(1 for address in addresses if loaded.lookup(address) is not None) / len(addresses)
+        print(f"{name:>12} │ {len(addresses):>9} │ {min(samples):>9.0f} │ {hit_rate:>8.1%}")
+
+    if args.json:
+        settings = {'ranges': len(ranges), 'lookups': args.lookups, 'repeat': args.repeat, 'seed': args.seed}
+        args.json.write_text(json.dumps(run_record('api_lambda.ip_ranges', 'nsPerOp', settings, results), indent=2))
+        print(f"📝 Results written to {args.json}")
+
+    if mismatches:
+        sys.exit(f"\n❌ {mismatches} lookups disagree with the reference longest-prefix match")
+    print('\n✅ All sampled lookups match the reference longest-prefix match')
+
+if __name__ == '__main__':
+    main()
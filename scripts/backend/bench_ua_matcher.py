@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the User-Agent bot matcher in api_lambda.py
+Compares the legacy any()-substring scan with the compiled trie regex,
+with and without the LRU verdict cache, for 1, 20 and 500 patterns
+"""
+
+import argparse
+import json
+import random
+import string
+import sys
+import timeit
+from functools import lru_cache
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'source' / 'backend'))
+
+from bench_baseline import run_record  # noqa: E402
+
+from api_lambda import BOT_USER_AGENT_PATTERNS, compile_user_agent_matcher  # noqa: E402
+
+SAMPLE_USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_2) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+    'python-requests/2.31.0',
+    'curl/8.4.0',
+]
+
+def build_patterns(count, seed=42):
+    """Return the production patterns padded with synthetic tokens up to count"""
+    patterns = list(BOT_USER_AGENT_PATTERNS[:count])
+    rng = random.Random(seed)
+    while len(patterns) < count:
+        token = ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 12)))
+        patterns.append(f"{token}{rng.choice(['bot', 'crawler', 'fetch', 'agent', ''])}")
+    return patterns
+
+def legacy_matcher(patterns):
+    """The original per-request any() scan"""
+    def match(user_agent):
+        user_agent = user_agent.lower()
+        return any(pattern in user_agent for pattern in patterns)
+    return match
+
+def compiled_matcher(patterns):
+    """Compiled trie regex without a verdict cache"""
+    regex = compile_user_agent_matcher(patterns)
+    def match(user_agent):
+        return regex.search(user_agent.lower()) is not None
+    return match
+
+def cached_matcher(patterns, cache_size=4096):
+    """Compiled trie regex behind the LRU verdict cache (repeat-UA flood)"""
+    regex = compile_user_agent_matcher(patterns)
+    @lru_cache(maxsize=cache_size)
+    def match(user_agent):
+        return regex.search(user_agent.lower()) is not None
+    return match
+
+def time_per_call(matcher, user_agents, number, repeat):
+    """Return the mean cost of one call in nanoseconds for every repeat"""
+    def run():
+        for user_agent in user_agents:
+            matcher(user_agent)
+    run()  # Warm up (and populate the cache for the cached variant)
+    return [elapsed / (number * len(user_agents)) * 1e9 for elapsed in timeit.repeat(run, number=number, repeat=repeat)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the User-Agent bot matcher')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 20, 500], help='Pattern counts to benchmark')
+    parser.add_argument('--number', type=int, default=2000, help='Iterations per timing run')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing runs per variant')
+    parser.add_argument('--json', type=Path, help='Write per-repeat samples to this path for bench_baseline.py')
+    args = parser.parse_args()
+    
+    variants = [
+        ('legacy any()', 'legacy', legacy_matcher),
+        ('compiled regex', 'compiled', compiled_matcher),
+        ('compiled + LRU', 'compiled-lru', cached_matcher),
+    ]
+    
+    print(f"{'patterns':>8} │ " + ' │ '.join(f"{name:>16}" for name, _, _ in variants))
+    print('─' * 9 + '┼' + '┼'.join('─' * 18 for _ in variants))
+    results = {}
+    for size in args.sizes:
+        patterns = build_patterns(size)
+        timings = []
+        for _, slug, factory in variants:
+            samples = time_per_call(factory(patterns), SAMPLE_USER_AGENTS, args.number, args.repeat)
+            results[f"ua_matcher[{slug}-{size}]"] = {'samplesNsPerOp': samples}
+            timings.append(min(samples) / 1000)
+        print(f"{size:>8} │ " + ' │ '.join(f"{timing:>13.3f} µs" for timing in timings))
+    
+    if args.json:
+        settings = {'sizes': args.sizes, 'number': args.number, 'repeat': args.repeat}
+        args.json.write_text(json.dumps(run_record('api_lambda.ua_matcher', 'nsPerOp', settings, results), indent=2))
+        print(f"📝 Results written to {args.json}")
+
+if __name__ == '__main__':
+    main()
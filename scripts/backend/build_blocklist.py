@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Build the Bloom filter blocklist of known-bad clients read by the API Lambda
+Collects source IPs, User-Agent hashes and IP + User-Agent fingerprints from
+exported WAF logs (blocked, challenged or Bot Control-labelled requests), from
+API request logs (shadow-banned submissions) and from plain IP and User-Agent
+lists, then writes a filter sized for the requested false-positive rate. The
+report gives the theoretical false-positive rate and one measured by probing
+keys that were never added.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'source' / 'backend'))
+
+from api_lambda import BloomFilter, blocklist_keys, hash_user_agent  # noqa: E402
+
+# WAF log actions that mark a request as bad
+WAF_BAD_ACTIONS = frozenset(('BLOCK', 'CAPTCHA', 'CHALLENGE'))
+WAF_BOT_LABEL_PREFIX = 'awswaf:managed:aws:bot-control:'
+
+def read_lines(path):
+    """Yield the lines of a plain or gzipped text file"""
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as source:
+        for line in source:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+def read_json_lines(path):
+    """Yield JSON records, skipping any prefix CloudWatch exports put before the object"""
+    for line in read_lines(path):
+        start = line.find('{')
+        if start < 0:
+            continue
+        try:
+            yield json.loads(line[start:])
+        except json.JSONDecodeError:
+            continue
+
+def waf_log_keys(path):
+    """Keys for requests the WAF blocked, challenged or labelled as bots"""
+    for record in read_json_lines(path):
+        labels = [label.get('name', '') for label in record.get('labels') or []]
+        if record.get('action') not in WAF_BAD_ACTIONS and not any(label.startswith(WAF_BOT_LABEL_PREFIX) for label in labels):
+            continue
+        request = record.get('httpRequest') or {}
+        source_ip = request.get('clientIp')
+        if not source_ip:
+            continue
+        user_agent = next(
+            (header.get('value', '') for header in request.get('headers') or [] if header.get('name', '').lower() == 'user-agent'),
+            ''
+        )
+        ip_key, _, fingerprint_key = blocklist_keys(source_ip, hash_user_agent(user_agent))
+        yield ip_key
+        yield fingerprint_key
+
+def request_log_keys(path):
+    """Fingerprint keys for shadow-banned submissions in API request logs"""
+    for record in read_json_lines(path):
+        if record.get('type') != 'request' or (record.get('details') or {}).get('action') != 'shadow-ban':
+            continue
+        if record.get('ip'):
+            yield blocklist_keys(record['ip'], record.get('uaHash') or hash_user_agent(''))[2]
+
+def ip_list_keys(path, skipped):
+    """Keys for a plain list of IPs; single-host CIDRs are accepted, wider ranges are counted in skipped"""
+    for line in read_lines(path):
+        address, _, prefix = line.split()[0].partition('/')
+        if prefix and prefix not in ('32', '128'):
+            skipped['ranges'] += 1
+            continue
+        yield blocklist_keys(address, '')[0]
+
+def user_agent_list_keys(path):
+    """Keys for a plain list of raw User-Agent strings"""
+    for line in read_lines(path):
+        yield blocklist_keys('', hash_user_agent(line))[1]
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the Bloom filter blocklist of known-bad clients')
+    parser.add_argument('--waf-logs', type=Path, nargs='*', default=[], help='WAF log files (JSON lines, optionally gzipped)')
+    parser.add_argument('--request-logs', type=Path, nargs='*', default=[], help='API request log exports (JSON lines)')
+    parser.add_argument('--ips', type=Path, nargs='*', default=[], help='Plain IP lists, one address per line')
+    parser.add_argument('--user-agents', type=Path, nargs='*', default=[], help='Plain User-Agent lists, one per line')
+    parser.add_argument('--min-hits', type=int, default=1, help='Only keep keys seen at least this many times')
+    parser.add_argument('--error-rate', type=float, default=0.001, help='Target false-positive rate')
+    parser.add_argument('--probes', type=int, default=100000, help='Absent keys probed to measure the false-positive rate')
+    parser.add_argument('--output', type=Path, default=Path('blocklist.bloom'), help='Filter file to write')
+    args = parser.parse_args()
+
+    hits = Counter()
+    skipped = Counter()
+    for path in args.waf_logs:
+        hits.update(waf_log_keys(path))
+    for path in args.request_logs:
+        hits.update(request_log_keys(path))
+    for path in args.ips:
+        hits.update(ip_list_keys(path, skipped))
+    for path in args.user_agents:
+        hits.update(user_agent_list_keys(path))
+
+    keys = [key for key, count in hits.items() if count >= args.min_hits]
+    if not keys:
+        sys.exit('❌ No keys collected; pass at least one of --waf-logs, --request-logs, --ips or --user-agents')
+    if skipped['ranges']:
+        print(f"⚠️  Skipped {skipped['ranges']} CIDR ranges wider than a single host")
+
+    bloom = BloomFilter.for_capacity(len(keys), args.error_rate)
+    for key in keys:
+        bloom.add(key)
+    args.output.write_bytes(bloom.to_bytes())
+
+    probes = max(args.probes, 1)
+    false_positives = sum(1 for index in range(probes) if f"probe:{index}" in bloom)
+    kinds = Counter(key.partition(':')[0] for key in keys)
+    print(f"✅ Wrote {args.output}: {len(keys)} keys ({kinds['ip']} IPs, {kinds['ua']} User-Agents, {kinds['fp']} fingerprints)")
+    print(f"   {bloom.bit_count} bits ({len(bloom.bits) / 1024:.1f} KiB, {bloom.bit_count / len(keys):.1f} bits/key), {bloom.hash_count} hashes")
+    print(f"   False-positive rate: {bloom.expected_error_rate():.4%} theoretical, "
+          f"{false_positives / probes:.4%} measured over {probes} absent keys")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Build the hosting IP range trie read by the API Lambda
+Reads one or more ranges JSON files (AWS ip-ranges.json, GCP cloud.json, Azure
+service tags or a {label: [cidr, ...]} map), optionally drops labels that should
+not count as hosting traffic, and writes the serialized trie that
+HOSTING_RANGES_PATH points at. The report compares the cold-start load time of
+the trie against building it from the JSON.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'source' / 'backend'))
+
+from api_lambda import IPRangeTrie, iter_ip_ranges  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description='Serialize hosting IP ranges into a trie for fast cold-start loading')
+    parser.add_argument('sources', type=Path, nargs='+', help='Ranges JSON files')
+    parser.add_argument('--exclude', nargs='*', default=[], help='Drop ranges whose label starts with any of these (e.g. aws:CLOUDFRONT)')
+    parser.add_argument('--output', type=Path, default=Path('hosting_ranges.trie'), help='Trie file to write')
+    args = parser.parse_args()
+
+    ranges = []
+    excluded = 0
+    for source in args.sources:
+        for cidr, label in iter_ip_ranges(json.loads(source.read_text())):
+            if any(label.startswith(prefix) for prefix in args.exclude):
+                excluded += 1
+            else:
+                ranges.append((cidr, label))
+    if not ranges:
+        sys.exit('❌ No ranges collected')
+
+    started = time.perf_counter()
+    trie = IPRangeTrie.from_ranges(ranges)
+    build_ms = (time.perf_counter() - started) * 1000
+    data = trie.to_bytes()
+    args.output.write_bytes(data)
+
+    started = time.perf_counter()
+    IPRangeTrie.from_bytes(data)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    nodes = {width: len(trie.tables[width][0]) - 1 for width in trie.tables}
+    print(f"✅ Wrote {args.output}: {len(trie)} ranges ({excluded} excluded), {len(trie.labels)} labels, "
+          f"{nodes[32]} IPv4 + {nodes[128]} IPv6 nodes, {len(data) / 1024:.1f} KiB")
+    print(f"   Load: {load_ms:.1f} ms from the trie vs {build_ms:.1f} ms building from JSON ranges")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Rewrite existing DynamoDB comment items in the canonical compact schema
+Legacy items store every value twice under long attribute names (name/commenter,
+comment/details, timestamp/created_at, isFake/silent_discard). This tool replaces
+each one with the short-name item the API Lambda now writes, roughly halving the
+per-comment storage and read cost. The API reads both schemas, so it is safe to
+run while the service is live and to re-run after an interruption.
+"""
+
+import argparse
+import os
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import boto3
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'source' / 'backend'))
+
+from api_lambda import TABLE_NAME, compact_comment_item, feed_bucket_for, is_compact_comment_item  # noqa: E402
+
+def iter_items(table, segment, total_segments):
+    """Scan the table, yielding full items"""
+    scan_kwargs = {'Segment': segment, 'TotalSegments': total_segments}
+    while True:
+        response = table.scan(**scan_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def item_size(item):
+    """Approximate DynamoDB item size in bytes (attribute names plus values)"""
+    size = 0
+    for name, value in item.items():
+        size += len(name.encode('utf-8'))
+        if isinstance(value, str):
+            size += len(value.encode('utf-8'))
+        elif isinstance(value, bool):
+            size += 1
+        elif isinstance(value, (int, float, Decimal)):
+            size += len(str(value)) // 2 + 1
+        else:
+            size += len(str(value).encode('utf-8'))
+    return size
+
+def rewrite_item(table, item, dry_run):
+    """Replace one legacy item with its compact form; return the compact item or None if skipped"""
+    compact = compact_comment_item(item)
+    compact.setdefault('feed_bucket', feed_bucket_for(item['id']))
+    if dry_run:
+        return compact
+
+    try:
+        table.put_item(
+            Item=compact,
+            ConditionExpression='attribute_exists(id)'  # Never resurrect concurrently deleted comments
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return None
+    return compact
+
+def main():
+    parser = argparse.ArgumentParser(description='Rewrite legacy comment items in the compact schema')
+    parser.add_argument('--table', default=TABLE_NAME, help='DynamoDB table name')
+    parser.add_argument('--region', default=os.environ.get('AWS_REGION', 'us-east-1'), help='AWS region')
+    parser.add_argument('--segments', type=int, default=1, help='Scan segments to split the table into')
+    parser.add_argument('--dry-run', action='store_true', help='Report changes without writing')
+    args = parser.parse_args()
+
+    table = boto3.resource('dynamodb', region_name=args.region).Table(args.table)
+
+    print(f"🔧 Compacting comment items in {args.table}{' (dry run)' if args.dry_run else ''}")
+    scanned = rewritten = bytes_before = bytes_after = 0
+    for segment in range(args.segments):
+        for item in iter_items(table, segment, args.segments):
+            scanned += 1
+            if not is_compact_comment_item(item):
+                compact = rewrite_item(table, item, args.dry_run)
+                if compact is not None:
+                    rewritten += 1
+                    bytes_before += item_size(item)
+                    bytes_after += item_size(compact)
+            if scanned % 1000 == 0:
+                print(f"   Scanned {scanned} items, {rewritten} {'to rewrite' if args.dry_run else 'rewritten'}")
+
+    print(f"✅ Done: scanned {scanned} items, {rewritten} {'to rewrite' if args.dry_run else 'rewritten'}")
+    if rewritten:
+        print(f"   Rewritten items: {bytes_before} → {bytes_after} bytes ({100 * (1 - bytes_after / bytes_before):.0f}% smaller)")
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n🛑 Rewrite interrupted")
+        sys.exit(1)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+In-process load harness for lambda_handler in api_lambda.py
+Generates (or replays) ALB events for every route in ROUTES with a mix of human,
+User-Agent bot and WAF-flagged bot traffic, JSON and form bodies, and drives them
+through the handler at a target rate across N worker processes. Storage runs on
+the in-memory (or SQLite) backend, so no network is involved. Reports p50/p95/p99
+latency and requests per second per route and per verdict, plus the memory
+high-water mark of the workers. The JSON report also carries the median latency
+of every sample window per route and verdict, as samples for bench_baseline.py.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+import urllib.parse
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / 'source' / 'backend'
+
+from bench_baseline import run_record  # noqa: E402
+
+HUMAN_USER_AGENTS = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148'
+)
+BOT_USER_AGENTS = (
+    'python-requests/2.31.0',
+    'curl/8.4.0',
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+    'Scrapy/2.11.0 (+https://scrapy.org)',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) HeadlessChrome/120.0.0.0 Safari/537.36'
+)
+# Sent as X-Admin-Token on human batch requests, so they exercise the batch write rather than the 404
+BATCH_ADMIN_TOKEN = 'load-harness'
+
+COMMENT_TEXTS = (
+    'Great stay, the staff were lovely.',
+    'Room was clean but the breakfast could be better.',
+    'Would definitely book again!',
+    'Check-in took forever, otherwise fine.'
+)
+
+def random_ip(rng):
+    return f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+def comment_fields(rng):
+    return {
+        'name': f"Guest {rng.randint(1, 9999)}",
+        'comment': rng.choice(COMMENT_TEXTS),
+        'rating': str(rng.randint(1, 5))
+    }
+
+def encode_body(fields, rng):
+    """Encode a body as JSON or as a form, returning (body, content type)"""
+    if rng.random() < 0.5:
+        return json.dumps(fields), 'application/json'
+    return urllib.parse.urlencode(fields), 'application/x-www-form-urlencoded'
+
+def generate_event(route, rng, bot_ratio, waf_ratio, demo_namespaces):
+    """Build one ALB event for a 'METHOD /path' route pattern"""
+    method, pattern = route.split(' ', 1)
+    path = pattern.replace('{demo}', rng.choice(demo_namespaces))
+    headers = {
+        'host': 'bench.example.com',
+        'accept': 'application/json',
+        'x-forwarded-for': random_ip(rng),
+        'x-forwarded-proto': 'https'
+    }
+    if rng.random() < bot_ratio:
+        headers['user-agent'] = rng.choice(BOT_USER_AGENTS)
+        if rng.random() < waf_ratio:
+            headers['x-amzn-waf-targeted-bot-detected'] = 'true'
+    else:
+        headers['user-agent'] = rng.choice(HUMAN_USER_AGENTS)
+        headers['accept-language'] = 'en-US,en;q=0.9'
+
+    query = None
+    body = None
+    if method == 'GET' and pattern.endswith('/comments'):
+        query = {'limit': str(rng.choice((10, 20, 50)))}
+    elif method == 'POST' and pattern.endswith('/batch'):
+        body = json.dumps({'comments': [comment_fields(rng) for _ in range(rng.randint(2, 30))]})
+        headers['content-type'] = 'application/json'
+        if 'accept-language' in headers:
+            headers['x-admin-token'] = BATCH_ADMIN_TOKEN  # Bots keep hitting the shadow-ban path
+    elif method == 'POST':
+        body, headers['content-type'] = encode_body(comment_fields(rng), rng)
+    elif method == 'DELETE':
+        body, headers['content-type'] = encode_body({'id': f"{int(time.time() * 1000)}_missing"}, rng)
+
+    return {
+        'requestContext': {'elb': {'targetGroupArn': 'arn:aws:elasticloadbalancing:us-east-1:000000000000:targetgroup/bench/0'}},
+        'httpMethod': method,
+        'path': path,
+        'queryStringParameters': query or {},
+        'headers': headers,
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def run_worker(worker_id, args, events, results):
+    """Drive events through lambda_handler at this worker's share of the target rate"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import api_lambda
+
+    rng = random.Random(args.seed + worker_id)
+    api_lambda.db.put_items([
+        api_lambda.build_comment_item(comment_fields(rng), random_ip(rng), rng.choice(HUMAN_USER_AGENTS))
+        for _ in range(args.seed_comments)
+    ])
+    routes = list(api_lambda.ROUTES)
+    sys.stdout = open(os.devnull, 'w')  # Request logs are sampled to zero; keep error lines out of the report
+
+    interval = args.workers / args.rate if args.rate else 0
+    samples = []
+    started = time.perf_counter()
+    next_send = started
+    sent = 0
+    while time.perf_counter() - started < args.duration:
+        if interval:
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            next_send += interval
+        if events:
+            event = json.loads(events[sent % len(events)])
+        else:
+            event = generate_event(rng.choice(routes), rng, args.bot_ratio, args.waf_ratio, api_lambda.DEMO_NAMESPACES)
+        request_started = time.perf_counter()
+        response = api_lambda.lambda_handler(event, None)
+        latency_ms = (time.perf_counter() - request_started) * 1000
+        window = int((request_started - started) / args.sample_window)
+        samples.append((api_lambda.request_log.route, api_lambda.request_log.verdict, latency_ms, response.get('statusCode', 200), window))
+        sent += 1
+
+    results.put({
+        'samples': samples,
+        'elapsed': time.perf_counter() - started,
+        'maxRssKb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    })
+
+def summarize(samples, elapsed, index):
+    """Group samples by the given tuple index and compute rps and latency percentiles"""
+    groups = {}
+    for sample in samples:
+        groups.setdefault(sample[index], []).append(sample)
+    summary = {}
+    for key, group in sorted(groups.items(), key=lambda pair: str(pair[0])):
+        latencies = [sample[2] for sample in group]
+        summary[str(key)] = {
+            'requests': len(group),
+            'rps': len(group) / elapsed,
+            'p50Ms': percentile(latencies, 0.50),
+            'p95Ms': percentile(latencies, 0.95),
+            'p99Ms': percentile(latencies, 0.99),
+            'errors': sum(1 for sample in group if sample[3] >= 500)
+        }
+    return summary
+
+def window_samples(samples, index, prefix):
+    """Median latency per sample window for each group, keyed '<prefix>[<group>]'"""
+    windows = {}
+    for sample in samples:
+        windows.setdefault(f"{prefix}[{sample[index]}]", {}).setdefault(sample[4], []).append(sample[2])
+    return {
+        name: {'samplesMs': [statistics.median(latencies) for _, latencies in sorted(groups.items())]}
+        for name, groups in sorted(windows.items())
+    }
+
+def print_table(title, summary):
+    print(f"\n{title:>36} │ {'requests':>8} │ {'rps':>9} │ {'p50':>8} │ {'p95':>8} │ {'p99':>8} │ 5xx")
+    print('─' * 37 + '┼' + '┼'.join('─' * width for width in (10, 11, 10, 10, 10)) + '┼' + '─' * 5)
+    for key, row in summary.items():
+        print(
+            f"{key:>36} │ {row['requests']:>8} │ {row['rps']:>9.1f} │ {row['p50Ms']:>5.3f} ms │ "
+            f"{row['p95Ms']:>5.3f} ms │ {row['p99Ms']:>5.3f} ms │ {row['errors']:>3}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive ALB events through lambda_handler and report latency percentiles')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--rate', type=float, default=0, help='Target requests per second across all workers (0 = unthrottled)')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds to run')
+    parser.add_argument('--bot-ratio', type=float, default=0.5, help='Fraction of generated requests sent with bot User-Agents')
+    parser.add_argument('--waf-ratio', type=float, default=0.3, help='Fraction of bot requests that also carry the WAF bot header')
+    parser.add_argument('--storage', choices=('memory', 'sqlite'), default='memory', help='Local storage backend')
+    parser.add_argument('--seed-comments', type=int, default=200, help='Comments stored per worker before the run')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for event generation')
+    parser.add_argument('--replay', type=Path, help='Replay ALB events from a JSONL file instead of generating them')
+    parser.add_argument('--dump-events', type=Path, help='Write N generated events as JSONL and exit (see --dump-count)')
+    parser.add_argument('--dump-count', type=int, default=1000, help='Events written by --dump-events')
+    parser.add_argument('--json', type=Path, help='Also write the report as JSON to this path')
+    parser.add_argument('--sample-window', type=float, default=1.0, help='Seconds per latency sample in the JSON report')
+    args = parser.parse_args()
+
+    # Must be set before any process imports api_lambda
+    os.environ['STORAGE_BACKEND'] = args.storage
+    os.environ.setdefault('SQLITE_PATH', f"/tmp/load_harness_{os.getpid()}.sqlite3")
+    os.environ['LOG_SAMPLE_RATES'] = 'human=0,bot=0,none=0'
+    os.environ['BATCH_ADMIN_TOKEN'] = BATCH_ADMIN_TOKEN
+
+    if args.dump_events:
+        sys.path.insert(0, str(BACKEND_DIR))
+        import api_lambda
+        rng = random.Random(args.seed)
+        with args.dump_events.open('w') as output:
+            for _ in range(args.dump_count):
+                route = rng.choice(list(api_lambda.ROUTES))
+                output.write(json.dumps(generate_event(route, rng, args.bot_ratio, args.waf_ratio, api_lambda.DEMO_NAMESPACES)) + '\n')
+        print(f"📝 Wrote {args.dump_count} events to {args.dump_events}")
+        return
+
+    events = args.replay.read_text().splitlines() if args.replay else []
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    workers = [context.Process(target=run_worker, args=(index, args, events, results)) for index in range(args.workers)]
+    print(f"🚀 {args.workers} worker(s), {'unthrottled' if not args.rate else f'{args.rate:.0f} req/s target'}, "
+          f"{args.duration:.0f}s, {args.storage} storage, {'replaying ' + str(args.replay) if args.replay else 'generated events'}")
+    for worker in workers:
+        worker.start()
+    reports = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    samples = [sample for report in reports for sample in report['samples']]
+    elapsed = max(report['elapsed'] for report in reports)
+    report = {
+        'workers': args.workers,
+        'targetRps': args.rate,
+        'durationS': elapsed,
+        'requests': len(samples),
+        'rps': len(samples) / elapsed,
+        'maxRssMb': max(report['maxRssKb'] for report in reports) / 1024,
+        'overall': summarize([('all', *sample[1:]) for sample in samples], elapsed, 0)['all'],
+        'routes': summarize(samples, elapsed, 0),
+        'verdicts': summarize(samples, elapsed, 1)
+    }
+
+    print_table('route', report['routes'])
+    print_table('verdict', report['verdicts'])
+    print(f"\n📊 {report['requests']} requests in {elapsed:.1f}s = {report['rps']:.1f} req/s, "
+          f"p50 {report['overall']['p50Ms']:.3f} ms, p99 {report['overall']['p99Ms']:.3f} ms, "
+          f"memory high-water {report['maxRssMb']:.1f} MB per worker")
+    if args.json:
+        settings = {
+            'workers': args.workers, 'targetRps': args.rate, 'duration': args.duration, 'storage': args.storage,
+            'botRatio': args.bot_ratio, 'wafRatio': args.waf_ratio, 'sampleWindow': args.sample_window
+        }
+        results = {**window_samples(samples, 0, 'route'), **window_samples(samples, 1, 'verdict')}
+        args.json.write_text(json.dumps({**run_record('api_lambda.load_harness', 'ms', settings, results), 'report': report}, indent=2))
+        print(f"📝 Report written to {args.json}")
+
+if __name__ == '__main__':
+    main()
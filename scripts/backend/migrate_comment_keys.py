@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Backfill the comment feed key schema on existing DynamoDB items
+Sets feed_bucket (and a numeric timestamp where missing) so that every comment
+is visible to the newest-first feed-index Query used by the API Lambda.
+Re-run with a new --bucket-count to rebalance items after changing FEED_BUCKET_COUNT.
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import boto3
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'source' / 'backend'))
+
+from api_lambda import FEED_BUCKET_COUNT, TABLE_NAME, feed_bucket_for  # noqa: E402
+
+def iter_items(table, segment, total_segments):
+    """Scan the table, yielding only the attributes the migration needs"""
+    scan_kwargs = {
+        'ProjectionExpression': 'id, feed_bucket, #ts, created_at',
+        'ExpressionAttributeNames': {'#ts': 'timestamp'},
+        'Segment': segment,
+        'TotalSegments': total_segments
+    }
+    while True:
+        response = table.scan(**scan_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def migrate_item(table, item, bucket_count, dry_run):
+    """Update one item in place; return True if it needed changes"""
+    expected_bucket = feed_bucket_for(item['id'], bucket_count)
+    needs_timestamp = 'timestamp' not in item
+    if item.get('feed_bucket') == expected_bucket and not needs_timestamp:
+        return False
+
+    if dry_run:
+        return True
+
+    update_kwargs = {
+        'Key': {'id': item['id']},
+        'UpdateExpression': 'SET feed_bucket = :bucket',
+        'ExpressionAttributeValues': {':bucket': expected_bucket},
+        'ConditionExpression': 'attribute_exists(id)'  # Never resurrect concurrently deleted comments
+    }
+    if needs_timestamp:
+        update_kwargs['UpdateExpression'] += ', #ts = :ts'
+        update_kwargs['ExpressionAttributeNames'] = {'#ts': 'timestamp'}
+        update_kwargs['ExpressionAttributeValues'][':ts'] = item.get('created_at', int(time.time() * 1000))
+
+    try:
+        table.update_item(**update_kwargs)
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill feed_bucket on existing comment items')
+    parser.add_argument('--table', default=TABLE_NAME, help='DynamoDB table name')
+    parser.add_argument('--region', default=os.environ.get('AWS_REGION', 'us-east-1'), help='AWS region')
+    parser.add_argument('--bucket-count', type=int, default=FEED_BUCKET_COUNT, help='Number of feed buckets (must match FEED_BUCKET_COUNT)')
+    parser.add_argument('--segments', type=int, default=1, help='Scan segments to split the table into')
+    parser.add_argument('--dry-run', action='store_true', help='Report changes without writing')
+    args = parser.parse_args()
+
+    table = boto3.resource('dynamodb', region_name=args.region).Table(args.table)
+
+    print(f"🔧 Migrating {args.table} to {args.bucket_count} feed bucket(s){' (dry run)' if args.dry_run else ''}")
+    scanned = updated = 0
+    for segment in range(args.segments):
+        for item in iter_items(table, segment, args.segments):
+            scanned += 1
+            if migrate_item(table, item, args.bucket_count, args.dry_run):
+                updated += 1
+            if scanned % 1000 == 0:
+                print(f"   Scanned {scanned} items, {updated} {'to update' if args.dry_run else 'updated'}")
+
+    print(f"✅ Done: scanned {scanned} items, {updated} {'to update' if args.dry_run else 'updated'}")
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n🛑 Migration interrupted")
+        sys.exit(1)
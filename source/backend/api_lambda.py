@@ -1,18 +1,177 @@
+import base64
+import bisect
+import hashlib
+import heapq
+import hmac
 import json
+import math
 import os
+import re
+import socket
+import sys
+import threading
 import time
 import random
 import string
+import struct
 import urllib.parse
+import zlib
+from array import array
+from collections import OrderedDict
+from functools import cached_property, lru_cache
+from itertools import islice
 from datetime import datetime, timezone
 from decimal import Decimal
-import boto3
-from botocore.exceptions import ClientError
 
 # DynamoDB configuration
 TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME', 'bot-deception-dev-comments')
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
 
+# Storage backend: 'dynamodb' in Lambda, 'memory' or 'sqlite' for offline benchmarks and CI
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'dynamodb')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', '/tmp/comments.sqlite3')
+
+# Comment feed layout: items are spread over N buckets ('comments#0'...) and
+# read newest-first through the feed index (feed_bucket hash, timestamp range)
+FEED_INDEX_NAME = os.environ.get('FEED_INDEX_NAME', 'feed-index')
+FEED_BUCKET_PREFIX = 'comments'
+FEED_BUCKET_COUNT = max(int(os.environ.get('FEED_BUCKET_COUNT', '1')), 1)
+
+# Comment pagination: only the attributes the frontend renders are read
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+# Compact attributes (n, c, r, sd) plus their legacy long names until every item is rewritten
+FEED_PROJECTION = 'id, feed_bucket, #ts, n, c, r, sd, #name, #comment, rating, silent_discard'
+FEED_PROJECTION_NAMES = {'#ts': 'timestamp', '#name': 'name', '#comment': 'comment'}
+FEED_ATTRIBUTES = frozenset(FEED_PROJECTION_NAMES.get(name, name) for name in FEED_PROJECTION.split(', '))
+
+# Legacy comment attributes replaced by the compact schema (see scripts/backend/compact_comment_items.py)
+LEGACY_COMMENT_ATTRIBUTES = frozenset(('name', 'commenter', 'comment', 'details', 'rating', 'created_at', 'isFake', 'silent_discard', 'userAgent'))
+
+# Batch ingestion: BatchWriteItem accepts at most 25 puts per call
+BATCH_MAX_COMMENTS = int(os.environ.get('BATCH_MAX_COMMENTS', '1000'))
+# Token callers must send as X-Admin-Token; without one the batch endpoint answers 404
+BATCH_ADMIN_TOKEN = os.environ.get('BATCH_ADMIN_TOKEN', '')
+BATCH_WRITE_CHUNK_SIZE = 25
+BATCH_WRITE_MAX_ATTEMPTS = 5
+BATCH_WRITE_BASE_DELAY = 0.05
+
+# Write-behind comment writes: human comments are acknowledged once queued (and spilled to
+# /tmp), then written with the batch path after the response (see CommentWriteQueue)
+WRITE_BEHIND = os.environ.get('WRITE_BEHIND', 'false').lower() == 'true'
+WRITE_BEHIND_DEADLINE = float(os.environ.get('WRITE_BEHIND_DEADLINE', '0.25'))
+WRITE_BEHIND_MAX_ITEMS = int(os.environ.get('WRITE_BEHIND_MAX_ITEMS', '1000'))
+WRITE_BEHIND_SPILL_PATH = os.environ.get('WRITE_BEHIND_SPILL_PATH', '/tmp/comment-write-behind.jsonl')
+
+# Per-container read cache for human comment pages (TTL of 0 disables it)
+COMMENT_CACHE_TTL = float(os.environ.get('COMMENT_CACHE_TTL', '2'))
+COMMENT_CACHE_MAX_ENTRIES = int(os.environ.get('COMMENT_CACHE_MAX_ENTRIES', '256'))
+
+# Decoy comment pool served to bots (optionally loaded from a JSON file)
+DECOY_POOL_SIZE = int(os.environ.get('DECOY_POOL_SIZE', '4096'))
+DECOY_POOL_PATH = os.environ.get('DECOY_POOL_PATH', '')
+DECOY_COMMENTS_PER_RESPONSE = 5
+
+# Flight catalog: bundled by default, or a JSON file re-read when its mtime changes
+FLIGHT_CATALOG_PATH = os.environ.get('FLIGHT_CATALOG_PATH', '')
+FLIGHT_CATALOG_CHECK_INTERVAL = float(os.environ.get('FLIGHT_CATALOG_CHECK_INTERVAL', '30'))
+
+# Conditional GETs: comment ETags follow a feed version bumped on every write, kept
+# fleet-wide in the counter table on DynamoDB and per container otherwise
+FEED_VERSION_KEY = 'feed-version#comments'
+
+# Proxies in front of the ALB that append to X-Forwarded-For (CloudFront: 1). The client IP is
+# the entry this many hops left of the one the ALB appends; anything further left is client-supplied
+TRUSTED_PROXY_HOPS = max(int(os.environ.get('TRUSTED_PROXY_HOPS', '1')), 0)
+
+# Value WAF's BotDetectedHeaderRule inserts as targeted-bot-detected. Terraform sets a random
+# secret, so a client sending the header itself cannot match it
+WAF_BOT_HEADER_VALUE = os.environ.get('WAF_BOT_HEADER_VALUE', 'true').lower()
+
+# Browsers may cache CORS preflight results for this many seconds
+CORS_MAX_AGE = int(os.environ.get('CORS_MAX_AGE', '86400'))
+
+# Bot detection configuration
+BOT_USER_AGENT_PATTERNS = (
+    'bot', 'crawler', 'spider', 'scraper', 'curl', 'wget', 'python', 'java',
+    'googlebot', 'bingbot', 'slurp', 'duckduckbot', 'baiduspider', 'yandexbot',
+    'facebookexternalhit', 'twitterbot', 'linkedinbot', 'whatsapp', 'telegram'
+)
+# Matched User-Agent patterns that name a crawler family rather than an HTTP library or tool
+CRAWLER_USER_AGENT_PATTERNS = frozenset((
+    'bot', 'crawler', 'spider', 'googlebot', 'bingbot', 'slurp', 'duckduckbot', 'baiduspider',
+    'yandexbot', 'facebookexternalhit', 'twitterbot', 'linkedinbot', 'whatsapp', 'telegram'
+))
+HEADLESS_USER_AGENT_REGEX = re.compile(r'headless|phantomjs|selenium|puppeteer|playwright|webdriver')
+
+# Bot score rules: (rule name, weight). A request scoring at least BOT_SCORE_THRESHOLD is
+# served as a bot, at least BOT_SCORE_SUSPECT as a suspect (see RequestContext.tier)
+BOT_SCORE_RULES = (
+    ('waf-targeted', 100),        # WAF Bot Control targeted-bot label, forwarded as a header
+    ('edge-bot-flag', 100),       # x-bot-detected set by the CloudFront function
+    ('ua-automation', 100),       # HTTP library or tool User-Agent (curl, python, java...)
+    ('ua-crawler', 100),          # Crawler family User-Agent (googlebot, spider...)
+    ('rapid-submissions', 100),   # Comment POSTs above SUBMISSION_RATE_LIMIT in this container
+    ('fleet-rate', 100),          # Requests above FLEET_RATE_LIMIT across all containers
+    ('blocklisted', 100),         # Source IP, User-Agent or both found in the blocklist
+    ('ua-headless', 70),          # Headless browser or automation driver
+    ('ua-missing', 60),           # No User-Agent at all
+    ('hosting-range', 20),        # Source IP in a hosting or cloud provider range; alone it stays human
+    ('waf-label', 40),            # Any other x-amzn-waf-* label header
+    ('no-accept-language', 30),   # Browser User-Agent without Accept-Language
+    ('no-fetch-metadata', 15),    # Browser User-Agent without Sec-Fetch-* headers
+    ('no-accept', 10),            # No Accept header
+    ('proxy-chain', 10)           # More than two X-Forwarded-For hops or X-Real-IP
+)
+BOT_SCORE_WEIGHTS = os.environ.get('BOT_SCORE_WEIGHTS', '')  # 'rule=weight,...' overrides
+BOT_SCORE_THRESHOLD = int(os.environ.get('BOT_SCORE_THRESHOLD', '100'))
+BOT_SCORE_SUSPECT = int(os.environ.get('BOT_SCORE_SUSPECT', '30'))
+UA_VERDICT_CACHE_SIZE = int(os.environ.get('UA_VERDICT_CACHE_SIZE', '4096'))
+
+# Rapid-submission detection: comment POSTs per (source IP, User-Agent) in a sliding window
+SUBMISSION_RATE_LIMIT = int(os.environ.get('SUBMISSION_RATE_LIMIT', '10'))  # 0 disables
+SUBMISSION_RATE_WINDOW = float(os.environ.get('SUBMISSION_RATE_WINDOW', '60'))
+SUBMISSION_RATE_SLOTS = 12
+SUBMISSION_TRACKER_MAX_KEYS = int(os.environ.get('SUBMISSION_TRACKER_MAX_KEYS', '10000'))
+
+# Fleet-wide per-client request counters in DynamoDB (an empty table name disables them)
+COUNTER_TABLE_NAME = os.environ.get('COUNTER_TABLE_NAME', '')
+FLEET_RATE_LIMIT = int(os.environ.get('FLEET_RATE_LIMIT', '600'))  # 0 counts without flagging
+FLEET_RATE_WINDOW = int(os.environ.get('FLEET_RATE_WINDOW', '60'))
+FLEET_COUNTER_FLUSH_INTERVAL = float(os.environ.get('FLEET_COUNTER_FLUSH_INTERVAL', '1'))
+FLEET_COUNTER_MAX_WRITES = int(os.environ.get('FLEET_COUNTER_MAX_WRITES', '5'))
+FLEET_COUNTER_CACHE_TTL = float(os.environ.get('FLEET_COUNTER_CACHE_TTL', '5'))
+FLEET_COUNTER_MAX_CLIENTS = 10000
+
+# Sticky verdicts: bot and suspect verdicts per client fingerprint, cached per container and
+# fleet-wide as TTL items in the counter table (a VERDICT_CACHE_TTL of 0 disables them)
+VERDICT_CACHE_TTL = int(os.environ.get('VERDICT_CACHE_TTL', '900'))
+VERDICT_CACHE_NEGATIVE_TTL = float(os.environ.get('VERDICT_CACHE_NEGATIVE_TTL', '30'))
+VERDICT_CACHE_MAX_ENTRIES = int(os.environ.get('VERDICT_CACHE_MAX_ENTRIES', '10000'))
+VERDICT_CACHE_FLUSH_INTERVAL = float(os.environ.get('VERDICT_CACHE_FLUSH_INTERVAL', '5'))
+VERDICT_CACHE_MAX_WRITES = int(os.environ.get('VERDICT_CACHE_MAX_WRITES', '25'))
+VERDICT_TABLE_NAME = os.environ.get('VERDICT_TABLE_NAME', COUNTER_TABLE_NAME)
+# TLS fingerprint headers added to the fingerprint when present (first match wins)
+VERDICT_FINGERPRINT_HEADERS = tuple(
+    name.strip().lower()
+    for name in os.environ.get('VERDICT_FINGERPRINT_HEADERS', 'cloudfront-viewer-ja4-fingerprint,cloudfront-viewer-ja3-fingerprint').split(',')
+    if name.strip()
+)
+
+# Blocklist of known-bad clients: a Bloom filter built by scripts/backend/build_blocklist.py,
+# read at cold start from a bundled file or from S3 through a /tmp cache (both empty disables it)
+BLOCKLIST_PATH = os.environ.get('BLOCKLIST_PATH', '')
+BLOCKLIST_S3_URI = os.environ.get('BLOCKLIST_S3_URI', '')
+BLOCKLIST_CACHE_PATH = '/tmp/blocklist.bloom'
+
+# Hosting and cloud provider IP ranges: a trie serialized by scripts/backend/build_ip_ranges.py,
+# or a ranges JSON (AWS ip-ranges.json, GCP cloud.json, Azure service tags) built at cold start
+HOSTING_RANGES_PATH = os.environ.get('HOSTING_RANGES_PATH', '')
+
+# Logging configuration
+LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', 'human=1.0,bot=0.1,none=0.1')
+LOG_DEBUG = os.environ.get('LOG_DEBUG', 'false').lower() == 'true'
+
 class DecimalEncoder(json.JSONEncoder):
     """Custom JSON encoder to handle Decimal types from DynamoDB"""
     def default(self, obj):
@@ -20,76 +179,1400 @@ class DecimalEncoder(json.JSONEncoder):
             return int(obj) if obj % 1 == 0 else float(obj)
         return super(DecimalEncoder, self).default(obj)
 
-class SimpleDynamoDB:
-    """Simple DynamoDB client using boto3 (available in Lambda runtime)"""
+def parse_sample_rates(spec):
+    """Parse 'verdict=rate,...' into a dict of sampling rates clamped to [0, 1]"""
+    rates = {}
+    for entry in spec.split(','):
+        verdict, _, rate = entry.partition('=')
+        try:
+            rates[verdict.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+@lru_cache(maxsize=UA_VERDICT_CACHE_SIZE)
+def hash_user_agent(user_agent):
+    """Return a short stable hash of a User-Agent for logs and counters"""
+    return hashlib.blake2b(user_agent.encode('utf-8', 'replace'), digest_size=8).hexdigest()
+
+class RequestLogger:
+    """Buffered structured logger emitting one JSON line per request.
     
-    def __init__(self, table_name):
+    Request lines are sampled per verdict, error lines are always kept and force
+    the request line, and the buffer is written to stdout once per invocation.
+    """
+    
+    def __init__(self, sample_rates, debug=False):
+        self.sample_rates = sample_rates
+        self.debug_enabled = debug
+        self._buffer = []
+        self._reset()
+    
+    def _reset(self):
+        self._fields = {}
+        self._details = {}
+        self._has_error = False
+        self._started = time.perf_counter()
+    
+    def start(self, method, path, source_ip, user_agent, request_id=None):
+        """Begin a new request record"""
+        self._reset()
+        self._fields = {
+            'type': 'request',
+            'requestId': request_id,
+            'method': method,
+            'route': f"{method} {path}" if method else path,
+            'status': None,
+            'latencyMs': None,
+            'verdict': 'none',
+            'reason': None,
+            'ip': source_ip,
+            'uaHash': hash_user_agent(user_agent) if user_agent else None,
+            'sampleRate': None,
+            'details': self._details
+        }
+    
+    @property
+    def route(self):
+        """Route of the current request record"""
+        return self._fields.get('route')
+    
+    @property
+    def verdict(self):
+        """Verdict of the current request record ('none' until one is set)"""
+        return self._fields.get('verdict')
+    
+    def set_route(self, route):
+        self._fields['route'] = route
+    
+    def set_verdict(self, verdict, reason=None):
+        self._fields['verdict'] = verdict
+        self._fields['reason'] = reason
+    
+    def annotate(self, **details):
+        """Attach handler-specific details to the request line"""
+        self._details.update(details)
+    
+    def _write(self, level, message, details):
+        self._buffer.append(json.dumps({
+            'type': 'log',
+            'level': level,
+            'requestId': self._fields.get('requestId'),
+            'message': message,
+            **details
+        }, cls=DecimalEncoder, default=str))
+    
+    def debug(self, message, **details):
+        if self.debug_enabled:
+            self._write('DEBUG', message, details)
+    
+    def info(self, message, **details):
+        self._write('INFO', message, details)
+    
+    def warning(self, message, **details):
+        self._write('WARNING', message, details)
+    
+    def error(self, message, **details):
+        self._has_error = True
+        self._write('ERROR', message, details)
+    
+    def finish(self, status):
+        """Close the request record, apply sampling and flush the buffer"""
+        fields = self._fields
+        if fields:
+            fields['status'] = status
+            fields['latencyMs'] = round((time.perf_counter() - self._started) * 1000, 3)
+            rate = self.sample_rates.get(fields['verdict'], 1.0)
+            fields['sampleRate'] = rate
+            if self._has_error or (status or 0) >= 500 or random.random() < rate:
+                self._buffer.append(json.dumps(fields, cls=DecimalEncoder, default=str))
+        self.flush()
+    
+    def flush(self):
+        if self._buffer:
+            sys.stdout.write('\n'.join(self._buffer) + '\n')
+            sys.stdout.flush()
+            self._buffer.clear()
+
+request_log = RequestLogger(parse_sample_rates(LOG_SAMPLE_RATES), debug=LOG_DEBUG)
+
+def feed_bucket_for(item_id, bucket_count=None):
+    """Return the feed bucket partition key for an item ID"""
+    bucket_count = bucket_count or FEED_BUCKET_COUNT
+    return f"{FEED_BUCKET_PREFIX}#{zlib.crc32(str(item_id).encode('utf-8')) % bucket_count}"
+
+def feed_buckets(bucket_count=None):
+    """Return every feed bucket partition key"""
+    return [f"{FEED_BUCKET_PREFIX}#{index}" for index in range(bucket_count or FEED_BUCKET_COUNT)]
+
+def encode_cursor(positions):
+    """Encode per-bucket read positions as an opaque URL-safe cursor.
+    
+    Each position is [] (start of bucket), [id, timestamp] (resume after that
+    item) or None (bucket exhausted). Returns None once every bucket is exhausted.
+    """
+    if all(position is None for position in positions):
+        return None
+    raw = json.dumps(positions, cls=DecimalEncoder, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+def decode_cursor(cursor, bucket_count=None):
+    """Decode a cursor from encode_cursor, raising ValueError if it is malformed"""
+    bucket_count = bucket_count or FEED_BUCKET_COUNT
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        positions = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError) as error:
+        raise ValueError('Invalid cursor') from error
+    
+    if not isinstance(positions, list) or len(positions) != bucket_count:
+        raise ValueError('Invalid cursor')
+    for position in positions:
+        if position is None or position == []:
+            continue
+        if (not isinstance(position, list) or len(position) != 2 or
+                not isinstance(position[0], str) or not isinstance(position[1], int)):
+            raise ValueError('Invalid cursor')
+    return positions
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after ttl seconds"""
+    
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+    
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+    
+    def set(self, key, value):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, namespace=None):
+        """Drop every entry, or only those keyed under namespace"""
+        if namespace is None:
+            self._entries.clear()
+        else:
+            for key in [key for key in self._entries if key[0] == namespace]:
+                del self._entries[key]
+    
+    def stats(self):
+        return {'cacheHits': self.hits, 'cacheMisses': self.misses, 'cacheEntries': len(self._entries)}
+
+class SlidingWindowCounter:
+    """Per-key event counts over a sliding window, with a hard cap on tracked keys.
+    
+    Each key holds a ring of fixed-width slot counters covering the window. A hit
+    clears the slots that expired since the key was last seen (at most one pass
+    over the ring) and bumps the current slot, so the cost is O(1) per hit. Keys
+    are evicted least-recently-seen first once max_keys is reached.
+    """
+    
+    def __init__(self, window, slots, max_keys):
+        self.slots = slots
+        self.slot_width = window / slots
+        self.max_keys = max_keys
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> [slot counts, last slot, total]
+    
+    def hit(self, key, now=None):
+        """Count one event for key and return the key's total within the window"""
+        slot = int((time.monotonic() if now is None else now) / self.slot_width)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [array('I', [0]) * self.slots, slot, 0]
+            if len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._entries.move_to_end(key)
+            counts, last_slot, total = entry
+            for expired in range(last_slot + 1, min(slot, last_slot + self.slots) + 1):
+                total -= counts[expired % self.slots]
+                counts[expired % self.slots] = 0
+            entry[1] = slot
+            entry[2] = total
+        entry[0][slot % self.slots] += 1
+        entry[2] += 1
+        return entry[2]
+    
+    def stats(self):
+        return {'trackedKeys': len(self._entries), 'evictions': self.evictions}
+
+submission_tracker = SlidingWindowCounter(SUBMISSION_RATE_WINDOW, SUBMISSION_RATE_SLOTS, SUBMISSION_TRACKER_MAX_KEYS)
+
+class DynamoDBResource:
+    """The boto3 DynamoDB resource shared by every table this module uses.
+    
+    boto3 is imported and the resource created on first use, so requests that never
+    touch DynamoDB (the bot paths) don't pay for it. errors catches nothing until
+    then, and afterwards both service errors (ClientError) and connection, timeout
+    and credential errors (BotoCoreError).
+    """
+    
+    def __init__(self, region):
+        self.region = region
+        self._resource = None
+        self.ClientError = ()
+        self.errors = ()
+    
+    @property
+    def resource(self):
+        if self._resource is None:
+            import boto3
+            from botocore.exceptions import BotoCoreError, ClientError
+            self.ClientError = ClientError
+            self.errors = (ClientError, BotoCoreError)
+            self._resource = boto3.resource('dynamodb', region_name=self.region)
+        return self._resource
+
+dynamodb = DynamoDBResource(AWS_REGION)
+
+class DynamoDBTable:
+    """Mixin for classes backed by one table (table_name) on the shared DynamoDB resource"""
+    
+    _table = None
+    
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = dynamodb.resource.Table(self.table_name)
+        return self._table
+    
+    @table.setter
+    def table(self, table):
+        self._table = table
+
+class FleetCounter(DynamoDBTable):
+    """Fleet-wide per-client hit counts in DynamoDB, pre-aggregated per container.
+    
+    Hits are summed locally per (client, fixed window) and flushed at most every
+    flush_interval seconds as one UpdateItem ADD per client, busiest first and at
+    most max_writes per flush. Each update returns the fleet-wide total, which is
+    cached for cache_ttl seconds; estimates add the hits not yet flushed. Counter
+    items expire through the table's TTL attribute.
+    """
+    
+    def __init__(self, table_name, window, flush_interval, max_writes, cache_ttl, max_clients):
+        self.table_name = table_name
+        self.window = window
+        self.flush_interval = flush_interval
+        self.max_writes = max_writes
+        self.max_clients = max_clients
+        self.totals = TTLCache(cache_ttl, max_clients)
+        self.pending = {}  # (client, window start) -> hits not yet flushed
+        self.last_flush = time.monotonic()
+    
+    @property
+    def enabled(self):
+        return bool(self.table_name)
+    
+    def add(self, client):
+        """Count one hit and return the client's estimated fleet-wide hits in the current window"""
+        key = (client, int(time.time()) // self.window * self.window)
+        hits = self.pending.get(key)
+        if hits is None and len(self.pending) >= self.max_clients:
+            hits = 0  # Full: estimate from the cached total without tracking a new client
+        else:
+            hits = self.pending[key] = (hits or 0) + 1
+        return (self.totals.get(key) or 0) + hits
+    
+    def flush(self, force=False):
+        """Write the busiest pending counters if the flush interval has passed; returns the number of writes"""
+        now = time.monotonic()
+        if not self.pending or (not force and now - self.last_flush < self.flush_interval):
+            return 0
+        self.last_flush = now
+        
+        # Counts for windows that already closed can no longer change a verdict
+        current_window = int(time.time()) // self.window * self.window
+        for key in [key for key in self.pending if key[1] < current_window]:
+            del self.pending[key]
+        
+        writes = 0
+        for key, hits in heapq.nlargest(self.max_writes, self.pending.items(), key=lambda pair: pair[1]):
+            client, window_start = key
+            try:
+                response = self.table.update_item(
+                    Key={'id': f"{client}#{window_start}"},
+                    UpdateExpression='ADD hits :hits SET expires_at = if_not_exists(expires_at, :expires)',
+                    ExpressionAttributeValues={':hits': hits, ':expires': window_start + 2 * self.window},
+                    ReturnValues='UPDATED_NEW'
+                )
+            except dynamodb.errors as error:
+                request_log.warning('Fleet counter flush error', error=str(error))
+                break
+            del self.pending[key]
+            self.totals.set(key, int(response['Attributes']['hits']))
+            writes += 1
+        request_log.annotate(fleetCounterWrites=writes, fleetCounterPending=len(self.pending))
+        return writes
+
+fleet_counter = FleetCounter(
+    COUNTER_TABLE_NAME, FLEET_RATE_WINDOW, FLEET_COUNTER_FLUSH_INTERVAL,
+    FLEET_COUNTER_MAX_WRITES, FLEET_COUNTER_CACHE_TTL, FLEET_COUNTER_MAX_CLIENTS
+)
+
+class VerdictCache(DynamoDBTable):
+    """Sticky bot and suspect verdicts keyed by client fingerprint.
+    
+    Lookups check a per-container cache first, then (when fetch is set) the
+    fleet-wide DynamoDB item; classify_request only fetches for requests that
+    would otherwise pass as human, so bot paths never load boto3. Misses are
+    remembered for a short negative TTL, so an unknown client costs at most one
+    GetItem per container per interval. New or stronger verdicts are queued once
+    per fingerprint across invocations and written with BatchWriteItem at most
+    every flush_interval seconds, oldest first and at most max_writes per flush,
+    so a bot spraying from fresh fingerprints costs one batch per interval rather
+    than a write per request. DynamoDB TTL expires them after the sticky window.
+    """
+    
+    TIER_RANK = {'human': 0, 'suspect': 1, 'bot': 2}
+    KEY_PREFIX = 'verdict#'
+    
+    def __init__(self, table_name, ttl, negative_ttl, max_entries, flush_interval, max_writes):
+        self.table_name = table_name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.max_writes = max_writes
+        self.local = TTLCache(ttl, max_entries)  # fingerprint -> (tier, expires_at epoch seconds)
+        self.misses = TTLCache(negative_ttl, max_entries)
+        self.pending = {}
+        self.last_flush = time.monotonic()
+    
+    @property
+    def enabled(self):
+        return self.ttl > 0
+    
+    def get(self, fingerprint, fetch=True):
+        """Return the sticky tier for a fingerprint, or None"""
+        entry = self.local.get(fingerprint)
+        if entry is None and fetch and self.table_name and self.misses.get(fingerprint) is None:
+            entry = self._fetch(fingerprint)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+    
+    def _fetch(self, fingerprint):
+        try:
+            item = self.table.get_item(Key={'id': self.KEY_PREFIX + fingerprint}).get('Item')
+        except dynamodb.errors as error:
+            request_log.warning('Verdict cache read error', error=str(error))
+            item = None
+        # TTL deletion lags expiry, so expired items still count as misses
+        if item is None or int(item['expires_at']) <= time.time():
+            self.misses.set(fingerprint, True)
+            return None
+        entry = (item['tier'], int(item['expires_at']))
+        self.local.set(fingerprint, entry)
+        return entry
+    
+    def record(self, fingerprint, tier):
+        """Make a verdict sticky unless the fingerprint already holds one at least as strong"""
+        entry = self.local.get(fingerprint)
+        if entry is not None and entry[1] > time.time() and self.TIER_RANK[entry[0]] >= self.TIER_RANK[tier]:
+            return
+        entry = (tier, int(time.time()) + self.ttl)
+        self.local.set(fingerprint, entry)
+        if self.table_name:
+            self.pending[fingerprint] = entry
+            while len(self.pending) > self.max_entries:
+                del self.pending[next(iter(self.pending))]
+    
+    def flush(self, force=False):
+        """Write the oldest queued verdicts if the flush interval has passed; returns the number written"""
+        now = time.monotonic()
+        if not self.pending or (not force and now - self.last_flush < self.flush_interval):
+            return 0
+        self.last_flush = now
+        table = self.table
+        entries = list(islice(self.pending.items(), self.max_writes))
+        for fingerprint, _ in entries:
+            del self.pending[fingerprint]
+        written = 0
+        for start in range(0, len(entries), BATCH_WRITE_CHUNK_SIZE):
+            chunk = entries[start:start + BATCH_WRITE_CHUNK_SIZE]
+            try:
+                response = dynamodb.resource.batch_write_item(RequestItems={table.name: [
+                    {'PutRequest': {'Item': {'id': self.KEY_PREFIX + fingerprint, 'tier': tier, 'expires_at': expires_at}}}
+                    for fingerprint, (tier, expires_at) in chunk
+                ]})
+            except dynamodb.errors as error:
+                request_log.warning('Verdict cache flush error', error=str(error))
+                for fingerprint, entry in entries[start:]:
+                    self.pending.setdefault(fingerprint, entry)
+                break
+            # Unprocessed puts are retried on the next flush, unless a newer verdict replaced them
+            unprocessed = response.get('UnprocessedItems', {}).get(table.name, [])
+            for request in unprocessed:
+                item = request['PutRequest']['Item']
+                self.pending.setdefault(item['id'][len(self.KEY_PREFIX):], (item['tier'], int(item['expires_at'])))
+            written += len(chunk) - len(unprocessed)
+        request_log.annotate(verdictCacheWrites=written, verdictCachePending=len(self.pending))
+        return written
+
+verdict_cache = VerdictCache(
+    VERDICT_TABLE_NAME, VERDICT_CACHE_TTL, VERDICT_CACHE_NEGATIVE_TTL,
+    VERDICT_CACHE_MAX_ENTRIES, VERDICT_CACHE_FLUSH_INTERVAL, VERDICT_CACHE_MAX_WRITES
+)
+
+class FeedVersion(DynamoDBTable):
+    """Version of the comment feed, bumped after every write and used for comment ETags.
+    
+    With a table the version is one fleet-wide item, re-read at most once per ttl
+    per container; comment pages are cached per version, so a tag never labels a
+    page read before it. Bumps are added to it by flush() when the invocation
+    ends (after the response only when the write-behind extension is active),
+    and no version is reported while any are pending. Without a table it is a per-container counter salted
+    with a random boot token and the current ttl bucket: the counter misses writes
+    made by other containers, so tags change at least once per ttl, like the cache.
+    """
+    
+    def __init__(self, table_name, ttl):
         self.table_name = table_name
-        self.region = AWS_REGION
-        self.dynamodb = boto3.resource('dynamodb', region_name=self.region)
-        self.table = self.dynamodb.Table(table_name)
+        self.ttl = ttl
+        self.local = 0
+        self.pending = 0
+        self.token = f"{random.getrandbits(32):08x}"
+        self.cached = None
+        self.cached_at = 0.0
+    
+    def current(self):
+        """Return the feed version as a string, or None if it cannot be read"""
+        if not self.table_name:
+            if self.ttl <= 0:
+                return None
+            return f"{self.token}.{self.local}.{int(time.time() // self.ttl)}"
+        if self.pending:
+            return None
+        now = time.monotonic()
+        if self.cached is not None and now - self.cached_at < self.ttl:
+            return self.cached
+        try:
+            item = self.table.get_item(Key={'id': FEED_VERSION_KEY}).get('Item')
+        except dynamodb.errors as error:
+            request_log.warning('Feed version read error', error=str(error))
+            return None
+        self.cached, self.cached_at = str(int(item['version']) if item else 0), now
+        return self.cached
+    
+    def bump(self):
+        """Mark the feed as changed"""
+        self.local += 1
+        if self.table_name:
+            self.pending += 1
+    
+    def flush(self):
+        """Add pending bumps to the fleet-wide version with one UpdateItem"""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, 0
+        try:
+            response = self.table.update_item(
+                Key={'id': FEED_VERSION_KEY},
+                UpdateExpression='ADD version :count',
+                ExpressionAttributeValues={':count': pending},
+                ReturnValues='UPDATED_NEW'
+            )
+        except dynamodb.errors as error:
+            request_log.warning('Feed version update error', error=str(error))
+            self.pending += pending
+            return
+        self.cached, self.cached_at = str(int(response['Attributes']['version'])), time.monotonic()
+
+feed_version = FeedVersion(COUNTER_TABLE_NAME if STORAGE_BACKEND == 'dynamodb' else '', COMMENT_CACHE_TTL)
+
+def flush_counter_writes():
+    """Write queued fleet counter hits, sticky verdicts and feed version bumps, logging rather than raising on failure.
+    
+    Runs after the response when the write-behind extension is active, otherwise in
+    lambda_handler's finally block, where an exception would replace the response.
+    """
+    try:
+        if fleet_counter.enabled:
+            fleet_counter.flush()
+    except Exception as error:
+        request_log.warning('Fleet counter flush failed', error=str(error))
+    try:
+        if verdict_cache.pending:
+            verdict_cache.flush()
+    except Exception as error:
+        request_log.warning('Verdict cache flush failed', error=str(error))
+    try:
+        feed_version.flush()
+    except Exception as error:
+        request_log.warning('Feed version flush failed', error=str(error))
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys.
+    
+    Bit positions come from double hashing one 128-bit blake2b digest per key. The
+    serialized form (magic, bit count, hash count, key count, bit array) is shared
+    with scripts/backend/build_blocklist.py, which builds the filter offline.
+    """
+    
+    MAGIC = b'BLM1'
+    HEADER = struct.Struct('>4sQBQ')
+    
+    def __init__(self, bit_count, hash_count, bits=None, count=0):
+        if bit_count <= 0 or hash_count <= 0:
+            raise ValueError('Bloom filter needs at least one bit and one hash')
+        self.bit_count = bit_count
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((bit_count + 7) // 8)
+        self.count = count
+        if len(self.bits) != (bit_count + 7) // 8:
+            raise ValueError('Bloom filter bit array does not match its bit count')
+    
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        """Size a filter for capacity keys at the given false-positive rate"""
+        capacity = max(capacity, 1)
+        bit_count = max(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        return cls(bit_count, max(round(bit_count / capacity * math.log(2)), 1))
+    
+    def __len__(self):
+        return self.count
+    
+    @staticmethod
+    def _hashes(key):
+        value = int.from_bytes(hashlib.blake2b(key.encode('utf-8', 'replace'), digest_size=16).digest(), 'little')
+        return value & 0xFFFFFFFFFFFFFFFF, value >> 64 | 1
+    
+    def add(self, key):
+        position, step = self._hashes(key)
+        for _ in range(self.hash_count):
+            position %= self.bit_count
+            self.bits[position >> 3] |= 1 << (position & 7)
+            position += step
+        self.count += 1
+    
+    def __contains__(self, key):
+        # Positions are generated one at a time: most absent keys miss on the first or second bit
+        position, step = self._hashes(key)
+        bits, bit_count = self.bits, self.bit_count
+        for _ in range(self.hash_count):
+            position %= bit_count
+            if not bits[position >> 3] >> (position & 7) & 1:
+                return False
+            position += step
+        return True
+    
+    def expected_error_rate(self):
+        """Theoretical false-positive rate at the current key count"""
+        return (1 - math.exp(-self.hash_count * self.count / self.bit_count)) ** self.hash_count
+    
+    def to_bytes(self):
+        return self.HEADER.pack(self.MAGIC, self.bit_count, self.hash_count, self.count) + bytes(self.bits)
+    
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < cls.HEADER.size:
+            raise ValueError('Bloom filter file is truncated')
+        magic, bit_count, hash_count, count = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError('Not a Bloom filter file')
+        return cls(bit_count, hash_count, bytearray(data[cls.HEADER.size:]), count)
+
+def blocklist_keys(source_ip, ua_hash):
+    """Blocklist keys for a client: its IP, its User-Agent hash and the pair of both"""
+    return (f"ip:{source_ip}", f"ua:{ua_hash}", f"fp:{source_ip}|{ua_hash}")
+
+def load_blocklist(path=BLOCKLIST_PATH, s3_uri=BLOCKLIST_S3_URI):
+    """Load the blocklist filter, downloading it from S3 once per container; None if unconfigured or unreadable"""
+    try:
+        if s3_uri:
+            path = BLOCKLIST_CACHE_PATH
+            if not os.path.exists(path):
+                import boto3
+                bucket, _, key = s3_uri.removeprefix('s3://').partition('/')
+                boto3.client('s3', region_name=AWS_REGION).download_file(bucket, key, path)
+        if not path:
+            return None
+        with open(path, 'rb') as blocklist_file:
+            return BloomFilter.from_bytes(blocklist_file.read())
+    except Exception as error:  # A broken blocklist must not take the API down
+        request_log.warning('Failed to load blocklist, continuing without it', path=path, error=str(error))
+        return None
+
+blocklist = load_blocklist()
+
+def parse_ip_address(address):
+    """Return (integer value, bit width) of an IPv4 or IPv6 address; raises OSError if invalid"""
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, address), 'big'), 32
+    except OSError:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET6, address), 'big'), 128
+
+class IPRangeTrie:
+    """Longest-prefix match over labelled IPv4 and IPv6 CIDR ranges.
+    
+    Each address family is a compressed (path-compressed binary) radix trie kept
+    as parallel lists (prefix bits, depth, label index, zero child, one child) with
+    the root at index 0, so a lookup visits at most one node per prefix bit and the
+    serialized form loads with struct.iter_unpack instead of re-inserting ranges.
+    """
+    
+    MAGIC = b'IPT1'
+    HEADER = struct.Struct('>4sIIII')  # magic, labels JSON size, range count, IPv4 nodes, IPv6 nodes
+    NODE_FORMATS = {32: struct.Struct('>IBiii'), 128: struct.Struct('>QQBiii')}
+    
+    def __init__(self):
+        self.labels = []
+        self._label_ids = {}
+        self.count = 0
+        self.tables = {width: ([0], [0], [-1], [-1], [-1]) for width in (32, 128)}
+    
+    def __len__(self):
+        return self.count
+    
+    @staticmethod
+    def _add_node(table, prefix, depth, label):
+        for column, value in zip(table, (prefix, depth, label, -1, -1)):
+            column.append(value)
+        return len(table[0]) - 1
+    
+    def insert(self, cidr, label):
+        """Add a CIDR range (e.g. '203.0.113.0/24') under label; a later label replaces an equal range's"""
+        address, _, length = cidr.strip().partition('/')
+        value, width = parse_ip_address(address)
+        length = int(length) if length else width
+        if not 0 <= length <= width:
+            raise ValueError(f"Invalid prefix length in '{cidr}'")
+        key = value >> (width - length)
+        label_id = self._label_ids.get(label)
+        if label_id is None:
+            label_id = self._label_ids[label] = len(self.labels)
+            self.labels.append(label)
+        
+        table = self.tables[width]
+        prefixes, depths, labels, zero, one = table
+        node = 0
+        while depths[node] != length:
+            depth = depths[node]
+            children = one if key >> (length - depth - 1) & 1 else zero
+            child = children[node]
+            if child < 0:
+                children[node] = self._add_node(table, key, length, label_id)
+                break
+            # Bits shared by the new range and the child's compressed path
+            child_depth = depths[child]
+            common = min(child_depth, length)
+            common -= ((prefixes[child] >> (child_depth - common)) ^ (key >> (length - common))).bit_length()
+            if common == child_depth:
+                node = child
+                continue
+            # Split the child's path at the first differing bit
+            middle = self._add_node(table, key >> (length - common), common, -1)
+            (one if prefixes[child] >> (child_depth - common - 1) & 1 else zero)[middle] = child
+            children[node] = middle
+            if common == length:
+                labels[middle] = label_id
+            else:
+                (one if key >> (length - common - 1) & 1 else zero)[middle] = self._add_node(table, key, length, label_id)
+            break
+        else:
+            labels[node] = label_id
+        self.count += 1
+    
+    def lookup(self, address):
+        """Label of the longest range containing address, or None (also for invalid addresses)"""
+        try:
+            value, width = parse_ip_address(address)
+        except OSError:
+            return None
+        if width == 128 and value >> 32 == 0xFFFF:  # IPv4-mapped IPv6
+            value, width = value & 0xFFFFFFFF, 32
+        prefixes, depths, labels, zero, one = self.tables[width]
+        node = 0
+        best = labels[0]
+        shift = width  # Address bits below the current node's path
+        while shift:
+            node = (one if value >> (shift - 1) & 1 else zero)[node]
+            if node < 0:
+                break
+            shift = width - depths[node]
+            if value >> shift != prefixes[node]:
+                break
+            if labels[node] >= 0:
+                best = labels[node]
+        return self.labels[best] if best >= 0 else None
+    
+    @classmethod
+    def from_ranges(cls, ranges):
+        """Build a trie from (cidr, label) pairs"""
+        trie = cls()
+        for cidr, label in ranges:
+            trie.insert(cidr, label)
+        return trie
+    
+    def to_bytes(self):
+        labels = json.dumps(self.labels, separators=(',', ':')).encode('utf-8')
+        parts = [self.HEADER.pack(self.MAGIC, len(labels), self.count, len(self.tables[32][0]), len(self.tables[128][0])), labels]
+        for width, node_format in self.NODE_FORMATS.items():
+            for prefix, depth, label, zero, one in zip(*self.tables[width]):
+                fields = (prefix >> 64, prefix & 0xFFFFFFFFFFFFFFFF) if width == 128 else (prefix,)
+                parts.append(node_format.pack(*fields, depth, label, zero, one))
+        return b''.join(parts)
+    
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < cls.HEADER.size:
+            raise ValueError('IP range trie file is truncated')
+        magic, labels_size, count, *node_counts = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError('Not an IP range trie file')
+        trie = cls()
+        offset = cls.HEADER.size
+        trie.labels = json.loads(data[offset:offset + labels_size])
+        trie._label_ids = {label: index for index, label in enumerate(trie.labels)}
+        trie.count = count
+        offset += labels_size
+        for (width, node_format), node_count in zip(cls.NODE_FORMATS.items(), node_counts):
+            end = offset + node_count * node_format.size
+            if end > len(data):
+                raise ValueError('IP range trie file is truncated')
+            rows = node_format.iter_unpack(data[offset:end])
+            if width == 128:
+                rows = ((high << 64 | low, *rest) for high, low, *rest in rows)
+            trie.tables[width] = tuple(list(column) for column in zip(*rows))
+            offset = end
+        return trie
+
+def iter_ip_ranges(document):
+    """Yield (cidr, label) pairs from AWS ip-ranges.json, GCP cloud.json, Azure service tags or a {label: [cidr, ...]} map"""
+    if 'values' in document:
+        for tag in document['values']:
+            for cidr in tag.get('properties', {}).get('addressPrefixes', []):
+                yield cidr, f"azure:{tag['name']}"
+    elif 'prefixes' in document:
+        entries = document['prefixes'] + document.get('ipv6_prefixes', [])
+        # AWS lists most ranges under both AMAZON and a specific service; the specific label is inserted last and wins
+        for entry in sorted(entries, key=lambda entry: entry.get('service') != 'AMAZON'):
+            if 'ip_prefix' in entry or 'ipv6_prefix' in entry:
+                yield entry.get('ip_prefix') or entry['ipv6_prefix'], f"aws:{entry.get('service')}:{entry.get('region')}"
+            elif 'ipv4Prefix' in entry or 'ipv6Prefix' in entry:
+                yield entry.get('ipv4Prefix') or entry['ipv6Prefix'], f"gcp:{entry.get('service')}:{entry.get('scope')}"
+    else:
+        for label, cidrs in document.items():
+            for cidr in cidrs:
+                yield cidr, label
+
+def load_hosting_ranges(path=HOSTING_RANGES_PATH):
+    """Load the hosting range trie from a serialized trie or a ranges JSON; None if unconfigured or unreadable"""
+    if not path:
+        return None
+    try:
+        with open(path, 'rb') as ranges_file:
+            data = ranges_file.read()
+        if data.startswith(IPRangeTrie.MAGIC):
+            return IPRangeTrie.from_bytes(data)
+        return IPRangeTrie.from_ranges(iter_ip_ranges(json.loads(data)))
+    except Exception as error:  # Like the blocklist, broken ranges must not take the API down
+        request_log.warning('Failed to load hosting ranges, continuing without them', path=path, error=str(error))
+        return None
+
+hosting_ranges = load_hosting_ranges()
+
+@lru_cache(maxsize=UA_VERDICT_CACHE_SIZE)
+def hosting_range_for(source_ip):
+    """Label of the hosting range containing source_ip, or None"""
+    if hosting_ranges is None or not source_ip:
+        return None
+    return hosting_ranges.lookup(source_ip)
+
+class CommentStore:
+    """Base class for comment storage backends.
+    
+    Subclasses implement the raw operations (_put, _put_if_absent, _put_batch,
+    _query_bucket, _delete) and set StorageError; this class adds feed buckets,
+    error handling, the read cache and the cursor-paginated bucket merge, so every
+    backend pages, caches and fails the same way.
+    """
+    
+    BACKEND_NAME = None
+    StorageError = ()  # Catches nothing until the backend library is loaded
+    
+    def __init__(self):
+        self.read_cache = TTLCache(COMMENT_CACHE_TTL, COMMENT_CACHE_MAX_ENTRIES)
+    
+    @staticmethod
+    def _stored(item):
+        return {**item, 'feed_bucket': feed_bucket_for(item['id'])}
+    
+    def _changed(self):
+        # Every demo namespace reads the same feed, so drop all cached pages and move every ETag on
+        self.read_cache.invalidate()
+        feed_version.bump()
+    
+    def warm_up(self):
+        """Open the backend connection ahead of the first request"""
+        return True
     
     def put_item(self, item):
-        """Add an item to DynamoDB table"""
+        """Add an item, assigning its feed bucket"""
         try:
-            self.table.put_item(Item=item)
+            self._put(self._stored(item))
+            self._changed()
             return True
-        except ClientError as error:
-            print(f'DynamoDB put error: {error}')
+        except self.StorageError as error:
+            request_log.error(f'{self.BACKEND_NAME} put error', error=str(error))
             return False
     
-    def get_items(self, limit=50):
-        """Get items from DynamoDB table"""
+    def put_item_if_absent(self, item):
+        """Add an item only if no item with its id exists; return True if it was written"""
         try:
-            # Try to query using the timestamp index first
-            try:
-                response = self.table.query(
-                    IndexName='timestamp-index',
-                    ScanIndexForward=False,  # Sort by timestamp descending
-                    Limit=limit
-                )
-                return response.get('Items', [])
-            except ClientError:
-                print('DynamoDB query error, falling back to scan')
-                # Fallback to scan if query fails
-                response = self.table.scan(Limit=limit)
-                items = response.get('Items', [])
-                # Sort by timestamp descending
-                return sorted(items, key=lambda x: x.get('timestamp', 0), reverse=True)
-        except ClientError as error:
-            print(f'DynamoDB scan error: {error}')
-            return []
+            written = self._put_if_absent(self._stored(item))
+        except self.StorageError as error:
+            request_log.error(f'{self.BACKEND_NAME} conditional put error', error=str(error))
+            return False
+        if written:
+            self._changed()
+        return written
+    
+    def put_items(self, items):
+        """Add several items; returns a list of booleans telling whether each one was stored"""
+        try:
+            stored = self._put_batch([self._stored(item) for item in items])
+        except self.StorageError as error:
+            request_log.error(f'{self.BACKEND_NAME} batch write error', error=str(error))
+            stored = [False] * len(items)
+        if any(stored):
+            self._changed()
+        return stored
+    
+    def get_page(self, limit=DEFAULT_PAGE_SIZE, cursor=None, namespace=FEED_BUCKET_PREFIX, version=None):
+        """Get one page of the most recent items, newest first.
+        
+        Pages are served from the per-container read cache when fresh, otherwise
+        at most limit items are read per bucket. Pages are cached per feed version
+        (read by the caller before the page), so a page cached under an older
+        version is never served under a newer ETag. Returns (items, next_cursor)
+        and raises ValueError for a malformed cursor.
+        """
+        cache_key = (namespace, limit, cursor, version)
+        cached = self.read_cache.get(cache_key)
+        request_log.annotate(cache='hit' if cached is not None else 'miss', **self.read_cache.stats())
+        if cached is not None:
+            return cached
+        
+        buckets = feed_buckets()
+        positions = decode_cursor(cursor) if cursor else [[] for _ in buckets]
+        
+        try:
+            pages = [
+                self._query_bucket(bucket, limit, position) if position is not None else ([], None)
+                for bucket, position in zip(buckets, positions)
+            ]
+        except self.StorageError as error:
+            request_log.error(f'{self.BACKEND_NAME} query error', error=str(error))
+            return [], None
+        
+        # Each bucket page is already sorted descending, so a k-way merge keeps the newest items
+        tagged = [[(index, item) for item in items] for index, (items, _) in enumerate(pages)]
+        merged = heapq.merge(*tagged, key=lambda pair: pair[1].get('timestamp', 0), reverse=True)
+        selected = list(islice(merged, limit))
+        
+        # Resume each bucket after the last item taken from it
+        consumed = [0] * len(buckets)
+        next_positions = list(positions)
+        for index, item in selected:
+            consumed[index] += 1
+            next_positions[index] = [item['id'], item['timestamp']]
+        for index, (items, last_key) in enumerate(pages):
+            if consumed[index] == len(items):
+                next_positions[index] = [last_key['id'], last_key['timestamp']] if last_key else None
+        
+        page = ([item for _, item in selected], encode_cursor(next_positions))
+        self.read_cache.set(cache_key, page)  # Failed reads return early and are never cached
+        return page
+    
+    def get_items(self, limit=DEFAULT_PAGE_SIZE):
+        """Get the most recent items, newest first"""
+        return self.get_page(limit)[0]
     
     def delete_item(self, item_id):
-        """Delete an item from DynamoDB table"""
+        """Delete an item by id"""
+        try:
+            self._delete(item_id)
+            self._changed()
+            return True
+        except self.StorageError as error:
+            request_log.error(f'{self.BACKEND_NAME} delete error', error=str(error))
+            return False
+
+class SimpleDynamoDB(CommentStore, DynamoDBTable):
+    """Simple DynamoDB client using boto3 (available in Lambda runtime).
+    
+    boto3 is imported and the Table resource created on first storage access, so
+    requests that never touch DynamoDB (the bot paths) don't pay for it.
+    """
+    
+    BACKEND_NAME = 'DynamoDB'
+    
+    def __init__(self, table_name):
+        super().__init__()
+        self.table_name = table_name
+    
+    @property
+    def StorageError(self):
+        return dynamodb.errors
+    
+    @property
+    def connected(self):
+        return self._table is not None
+    
+    def warm_up(self):
+        """Create the client and open a connection with a cheap keyed read"""
         try:
-            self.table.delete_item(Key={'id': item_id})
+            self.table.get_item(Key={'id': '__warmup__'}, ProjectionExpression='id')
             return True
-        except ClientError as error:
-            print(f'DynamoDB delete error: {error}')
+        except self.StorageError as error:
+            request_log.warning('DynamoDB warm-up error', error=str(error))
             return False
+    
+    def _put(self, item):
+        self.table.put_item(Item=item)
+    
+    def _put_if_absent(self, item):
+        try:
+            self.table.put_item(Item=item, ConditionExpression='attribute_not_exists(id)')
+            return True
+        except self.StorageError as error:
+            if isinstance(error, dynamodb.ClientError) and error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+    
+    def _put_batch(self, items):
+        """BatchWriteItem in chunks of 25, retrying unprocessed items with backoff"""
+        stored = [False] * len(items)
+        self.table  # Creates the client on first use
+        for chunk_start in range(0, len(items), BATCH_WRITE_CHUNK_SIZE):
+            pending = {
+                index: {'PutRequest': {'Item': items[index]}}
+                for index in range(chunk_start, min(chunk_start + BATCH_WRITE_CHUNK_SIZE, len(items)))
+            }
+            for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+                if attempt:
+                    # Exponential backoff with full jitter before retrying unprocessed items
+                    time.sleep(random.uniform(0, BATCH_WRITE_BASE_DELAY * (2 ** (attempt - 1))))
+                try:
+                    response = dynamodb.resource.batch_write_item(RequestItems={self.table_name: list(pending.values())})
+                except self.StorageError as error:
+                    request_log.error('DynamoDB batch write error', error=str(error), attempt=attempt)
+                    continue
+                unprocessed_ids = {
+                    request['PutRequest']['Item']['id']
+                    for request in response.get('UnprocessedItems', {}).get(self.table_name, [])
+                }
+                for index in list(pending):
+                    if items[index]['id'] not in unprocessed_ids:
+                        stored[index] = True
+                        del pending[index]
+                if not pending:
+                    break
+            if pending:
+                request_log.error('DynamoDB batch write gave up on items', count=len(pending))
+        return stored
+    
+    def _query_bucket(self, bucket, limit, position):
+        query_kwargs = {
+            'IndexName': FEED_INDEX_NAME,
+            'KeyConditionExpression': 'feed_bucket = :bucket',
+            'ExpressionAttributeValues': {':bucket': bucket},
+            'ProjectionExpression': FEED_PROJECTION,
+            'ExpressionAttributeNames': FEED_PROJECTION_NAMES,
+            'ScanIndexForward': False,  # Sort by timestamp descending
+            'Limit': limit
+        }
+        if position:
+            query_kwargs['ExclusiveStartKey'] = {'id': position[0], 'feed_bucket': bucket, 'timestamp': position[1]}
+        response = self.table.query(**query_kwargs)
+        return response.get('Items', []), response.get('LastEvaluatedKey')
+    
+    def _delete(self, item_id):
+        self.table.delete_item(Key={'id': item_id})
 
-# Initialize DynamoDB client
-db = SimpleDynamoDB(TABLE_NAME)
+class MemoryStore(CommentStore):
+    """In-process backend with DynamoDB feed semantics, for offline load tests and CI.
+    
+    Each bucket keeps a sorted list of (-timestamp, id) keys, so a page is a bisect
+    plus a slice. Contents live only as long as the container.
+    """
+    
+    BACKEND_NAME = 'Memory'
+    
+    def __init__(self):
+        super().__init__()
+        self.items = {}
+        self.bucket_keys = {}
+    
+    @staticmethod
+    def _sort_key(item):
+        return (-item.get('timestamp', 0), item['id'])
+    
+    def _put(self, item):
+        self._delete(item['id'])
+        self.items[item['id']] = item
+        bisect.insort(self.bucket_keys.setdefault(item['feed_bucket'], []), self._sort_key(item))
+    
+    def _put_if_absent(self, item):
+        if item['id'] in self.items:
+            return False
+        self._put(item)
+        return True
+    
+    def _put_batch(self, items):
+        for item in items:
+            self._put(item)
+        return [True] * len(items)
+    
+    def _query_bucket(self, bucket, limit, position):
+        keys = self.bucket_keys.get(bucket, [])
+        start = bisect.bisect_right(keys, (-position[1], position[0])) if position else 0
+        page_keys = keys[start:start + limit]
+        items = [
+            {name: value for name, value in self.items[item_id].items() if name in FEED_ATTRIBUTES}
+            for _, item_id in page_keys
+        ]
+        # Like DynamoDB, a full page always reports a last key even if nothing follows
+        last_key = {'id': page_keys[-1][1], 'timestamp': -page_keys[-1][0]} if len(page_keys) == limit else None
+        return items, last_key
+    
+    def _delete(self, item_id):
+        item = self.items.pop(item_id, None)
+        if item is not None:
+            keys = self.bucket_keys[item['feed_bucket']]
+            del keys[bisect.bisect_left(keys, self._sort_key(item))]
 
-def send_response(status_code, body, headers=None):
-    """Create a Lambda response object"""
-    default_headers = {
-        'Content-Type': 'application/json',
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-    }
+class SQLiteStore(CommentStore):
+    """SQLite file backend with the same feed semantics as MemoryStore.
+    
+    Items are stored as JSON next to their feed keys and read in (timestamp DESC,
+    id ASC) order. sqlite3 is imported on first access like boto3 is.
+    """
+    
+    BACKEND_NAME = 'SQLite'
+    
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._connection = None
+    
+    @property
+    def connection(self):
+        if self._connection is None:
+            import sqlite3
+            self.StorageError = sqlite3.Error
+            # The write-behind queue may flush from a background thread
+            self._connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            self._connection.executescript(
+                'PRAGMA journal_mode=WAL;'
+                'CREATE TABLE IF NOT EXISTS comments ('
+                '  id TEXT PRIMARY KEY, feed_bucket TEXT NOT NULL, timestamp INTEGER NOT NULL, item TEXT NOT NULL);'
+                'CREATE INDEX IF NOT EXISTS feed_index ON comments (feed_bucket, timestamp DESC, id);'
+            )
+        return self._connection
+    
+    @staticmethod
+    def _row(item):
+        return (item['id'], item['feed_bucket'], int(item.get('timestamp', 0)), json.dumps(item, cls=DecimalEncoder))
+    
+    def warm_up(self):
+        """Open the database file and create the schema"""
+        try:
+            self.connection
+            return True
+        except self.StorageError as error:
+            request_log.warning('SQLite warm-up error', error=str(error))
+            return False
+    
+    def _put(self, item):
+        self.connection.execute('INSERT OR REPLACE INTO comments VALUES (?, ?, ?, ?)', self._row(item))
+    
+    def _put_if_absent(self, item):
+        return self.connection.execute('INSERT OR IGNORE INTO comments VALUES (?, ?, ?, ?)', self._row(item)).rowcount == 1
+    
+    def _put_batch(self, items):
+        with self.connection:  # One transaction for the whole batch
+            self.connection.execute('BEGIN')
+            self.connection.executemany('INSERT OR REPLACE INTO comments VALUES (?, ?, ?, ?)', [self._row(item) for item in items])
+        return [True] * len(items)
+    
+    def _query_bucket(self, bucket, limit, position):
+        if position:
+            rows = self.connection.execute(
+                'SELECT item FROM comments WHERE feed_bucket = ? AND (timestamp < ? OR (timestamp = ? AND id > ?))'
+                ' ORDER BY timestamp DESC, id LIMIT ?',
+                (bucket, position[1], position[1], position[0], limit)
+            ).fetchall()
+        else:
+            rows = self.connection.execute(
+                'SELECT item FROM comments WHERE feed_bucket = ? ORDER BY timestamp DESC, id LIMIT ?', (bucket, limit)
+            ).fetchall()
+        items = [
+            {name: value for name, value in json.loads(row[0]).items() if name in FEED_ATTRIBUTES}
+            for row in rows
+        ]
+        last_key = {'id': items[-1]['id'], 'timestamp': items[-1]['timestamp']} if len(items) == limit else None
+        return items, last_key
+    
+    def _delete(self, item_id):
+        self.connection.execute('DELETE FROM comments WHERE id = ?', (item_id,))
+
+STORAGE_BACKENDS = {
+    'dynamodb': lambda: SimpleDynamoDB(TABLE_NAME),
+    'memory': MemoryStore,
+    'sqlite': lambda: SQLiteStore(SQLITE_PATH)
+}
+
+def create_comment_store(backend=STORAGE_BACKEND):
+    """Create the comment store selected by STORAGE_BACKEND"""
+    try:
+        return STORAGE_BACKENDS[backend.lower()]()
+    except KeyError:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected one of: {', '.join(STORAGE_BACKENDS)})")
+
+# Initialize the comment store
+db = create_comment_store()
+
+class CommentWriteQueue:
+    """Write-behind queue for human comment writes.
+    
+    Comments are acknowledged once appended to the queue and its /tmp spill file,
+    then written through the store's batch path off the response path: on Lambda
+    by an internal extension thread after the response has been returned (the
+    execution environment is not frozen until it asks for the next event),
+    elsewhere by a background thread once the oldest entry reaches the deadline,
+    holding lock so it never runs alongside the handler on the same store.
+    If the extension cannot register, lambda_handler flushes before returning.
+    Entries left in the spill file by a crashed runtime are replayed at start.
+    The extension also runs post_response_tasks after every invocation.
+    """
+    
+    EXTENSION_API_VERSION = '2020-01-01'
+    
+    def __init__(self, store, deadline, max_items, spill_path, lock):
+        self.store = store
+        self.lock = lock
+        self.deadline = deadline
+        self.max_items = max_items
+        self.spill_path = spill_path
+        self.entries = []  # (time.monotonic() when queued, item)
+        self.condition = threading.Condition()
+        self.completed_invocations = 0
+        self.extension_active = False
+        self.post_response_tasks = []  # Callables that must not raise
+        self._thread = None
+        self._replay_spill()
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def _replay_spill(self):
+        try:
+            with open(self.spill_path, encoding='utf-8') as spill:
+                queued_at = time.monotonic()
+                self.entries = [(queued_at, json.loads(line)) for line in spill if line.strip()]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as error:
+            request_log.warning('Failed to replay write-behind spill', path=self.spill_path, error=str(error))
+    
+    def _rewrite_spill(self):
+        """Make the spill file match the queue; called with the condition held"""
+        try:
+            if not self.entries:
+                if os.path.exists(self.spill_path):
+                    os.remove(self.spill_path)
+                return
+            with open(self.spill_path, 'w', encoding='utf-8') as spill:
+                spill.writelines(json.dumps(item, cls=DecimalEncoder) + '\n' for _, item in self.entries)
+        except OSError as error:
+            request_log.warning('Write-behind spill error', path=self.spill_path, error=str(error))
+    
+    def start(self):
+        """Register the Lambda extension thread, or start the deadline thread outside Lambda"""
+        runtime_api = os.environ.get('AWS_LAMBDA_RUNTIME_API')
+        if runtime_api:
+            try:
+                self._register_extension(runtime_api)
+            except Exception as error:  # Fall back to flushing before each response
+                request_log.warning('Write-behind extension registration failed', error=str(error))
+        else:
+            self._thread = threading.Thread(target=self._run_deadline_flusher, name='comment-write-behind', daemon=True)
+            self._thread.start()
+    
+    def append(self, item):
+        """Queue an item; returns False when the queue is full and the caller must write synchronously"""
+        with self.condition:
+            if len(self.entries) >= self.max_items:
+                return False
+            self.entries.append((time.monotonic(), item))
+            try:
+                with open(self.spill_path, 'a', encoding='utf-8') as spill:
+                    spill.write(json.dumps(item, cls=DecimalEncoder) + '\n')
+            except OSError as error:
+                request_log.warning('Write-behind spill error', path=self.spill_path, error=str(error))
+            self.condition.notify_all()
+        return True
+    
+    def flush(self):
+        """Write every queued item with one batch write; failed items stay queued. Returns the number stored"""
+        with self.condition:
+            batch, self.entries = self.entries, []
+        if not batch:
+            return 0
+        stored = self.store.put_items([item for _, item in batch])
+        failed = [entry for entry, ok in zip(batch, stored) if not ok]
+        with self.condition:
+            self.entries[:0] = failed
+            self._rewrite_spill()
+        # Flush lag: how long the oldest comment waited between acknowledgement and storage
+        request_log.info(
+            'Write-behind flush',
+            writeBehindStored=len(batch) - len(failed),
+            writeBehindFailed=len(failed),
+            writeBehindLagMs=round((time.monotonic() - batch[0][0]) * 1000, 3)
+        )
+        return len(batch) - len(failed)
+    
+    def invocation_done(self):
+        """Called by lambda_handler after every invocation, whatever its outcome"""
+        with self.condition:
+            self.completed_invocations += 1
+            self.condition.notify_all()
+        if not self.extension_active and self._thread is None and self.entries:
+            self.flush()
     
-    if headers:
-        default_headers.update(headers)
+    def _run_deadline_flusher(self):
+        while True:
+            with self.condition:
+                while not self.entries:
+                    self.condition.wait()
+                remaining = self.entries[0][0] + self.deadline - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+            with self.lock:
+                self._flush_safely()
+            with self.condition:
+                if self.entries:
+                    self.condition.wait(self.deadline)  # Back off before retrying failed writes
     
+    def _flush_safely(self):
+        try:
+            self.flush()
+        except Exception as error:
+            request_log.error('Write-behind flush failed', error=str(error))
+        request_log.flush()
+    
+    def _register_extension(self, runtime_api):
+        import urllib.request
+        base_url = f"http://{runtime_api}/{self.EXTENSION_API_VERSION}/extension"
+        registration = urllib.request.Request(
+            f"{base_url}/register",
+            data=json.dumps({'events': ['INVOKE']}).encode('utf-8'),
+            headers={'Lambda-Extension-Name': os.path.basename(__file__)},
+            method='POST'
+        )
+        with urllib.request.urlopen(registration, timeout=2) as response:
+            extension_id = response.headers['Lambda-Extension-Identifier']
+        self.extension_active = True
+        self._thread = threading.Thread(
+            target=self._run_extension, args=(base_url, extension_id), name='comment-write-behind', daemon=True
+        )
+        self._thread.start()
+    
+    def _run_extension(self, base_url, extension_id):
+        """Extension loop: each /next call reports the previous invocation done and blocks until the next starts"""
+        import urllib.request
+        next_event = urllib.request.Request(f"{base_url}/event/next", headers={'Lambda-Extension-Identifier': extension_id})
+        invocations = 0
+        while True:
+            try:
+                with urllib.request.urlopen(next_event) as response:
+                    response.read()
+            except Exception as error:
+                request_log.warning('Write-behind extension error', error=str(error))
+                time.sleep(0.1)
+                continue
+            invocations += 1
+            # The response is returned as soon as the handler finishes; flush after that
+            with self.condition:
+                while self.completed_invocations < invocations:
+                    self.condition.wait()
+            for task in self.post_response_tasks:
+                task()
+            if self.entries:
+                self._flush_safely()
+            request_log.flush()
+
+# Held for each invocation. The deadline flusher takes it too, because it shares the store
+# (a single SQLite connection with explicit transactions), read cache and feed version
+invocation_lock = threading.Lock()
+
+write_queue = None
+if WRITE_BEHIND:
+    write_queue = CommentWriteQueue(db, WRITE_BEHIND_DEADLINE, WRITE_BEHIND_MAX_ITEMS, WRITE_BEHIND_SPILL_PATH, invocation_lock)
+    write_queue.post_response_tasks.append(flush_counter_writes)
+    write_queue.start()
+
+# Shared by every JSON response; never mutate it, pass extra headers instead
+DEFAULT_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+    'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
+}
+
+def send_serialized_response(status_code, body, headers=None):
+    """Create a Lambda response object from an already JSON-encoded body"""
     return {
         'statusCode': status_code,
-        'headers': default_headers,
-        'body': json.dumps(body, cls=DecimalEncoder)
+        'headers': {**DEFAULT_HEADERS, **headers} if headers else DEFAULT_HEADERS,
+        'body': body
     }
 
+def send_response(status_code, body, headers=None):
+    """Create a Lambda response object"""
+    return send_serialized_response(status_code, json.dumps(body, cls=DecimalEncoder), headers)
+
+def etag_headers(etag):
+    # no-cache lets browsers keep the body but revalidate it on every request
+    return {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+def etag_matches(request, etag):
+    """Whether If-None-Match names etag (weak comparison, as RFC 9110 specifies for GET)"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    return header.strip() == '*' or any(tag.strip().removeprefix('W/') == etag for tag in header.split(','))
+
+def send_not_modified(etag):
+    """304 response with no body for a client that already holds etag"""
+    request_log.annotate(notModified=True)
+    return send_serialized_response(304, '', etag_headers(etag))
+
 def parse_body(body, content_type):
     """Parse request body based on content type"""
     if not body:
@@ -107,202 +1590,779 @@ def parse_body(body, content_type):
             except json.JSONDecodeError:
                 return dict(urllib.parse.parse_qsl(body))
     except Exception as error:
-        print(f'Error parsing body: {error}')
+        request_log.warning('Error parsing body', error=str(error))
         return {}
 
-def generate_fake_comment():
+FAKE_COMMENTS = (
+    "Great article! Very informative.",
+    "Thanks for sharing this valuable information.",
+    "I found this really helpful for my project.",
+    "Excellent explanation of the concepts.",
+    "This solved my problem perfectly!",
+    "Well written and easy to understand.",
+    "Looking forward to more content like this.",
+    "This is exactly what I was looking for."
+)
+FAKE_COMMENT_FOLLOWUPS = (
+    "", " Bookmarked for later.", " Shared this with my team.", " Keep up the good work!",
+    " Five stars from me.", " Will definitely come back."
+)
+FAKE_FIRST_NAMES = (
+    "Alex", "Sarah", "Mike", "Emma", "David", "Lisa", "John", "Maria",
+    "Chris", "Priya", "Tom", "Hannah", "Daniel", "Olivia", "Kevin", "Sofia"
+)
+FAKE_LAST_NAMES = (
+    "Johnson", "Chen", "Rodriguez", "Thompson", "Kim", "Wang", "Smith", "Garcia",
+    "Patel", "Nguyen", "Miller", "Brown", "Lee", "Martin", "Silva", "Walker"
+)
+RANDOM_ID_ALPHABET = string.ascii_lowercase + string.digits
+# Maps every byte value onto the ID alphabet, for turning random bytes into ID suffixes in bulk
+_RANDOM_ID_BYTE_TABLE = bytes(ord(RANDOM_ID_ALPHABET[value % len(RANDOM_ID_ALPHABET)]) for value in range(256))
+
+def generate_fake_comment(rng=random, now_ms=None):
     """Generate a fake comment for bot deception"""
-    fake_comments = [
-        "Great article! Very informative.",
-        "Thanks for sharing this valuable information.",
-        "I found this really helpful for my project.",
-        "Excellent explanation of the concepts.",
-        "This solved my problem perfectly!",
-        "Well written and easy to understand.",
-        "Looking forward to more content like this.",
-        "This is exactly what I was looking for."
-    ]
-    
-    fake_names = [
-        "Alex Johnson", "Sarah Chen", "Mike Rodriguez", "Emma Thompson",
-        "David Kim", "Lisa Wang", "John Smith", "Maria Garcia"
-    ]
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
     
     # Generate random ID
-    random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=9))
-    fake_id = f"fake_{int(time.time() * 1000)}_{random_suffix}"
-    
-    # Random timestamp within last 24 hours
-    random_time = int(time.time() * 1000) - random.randint(0, 86400000)
+    random_suffix = ''.join(rng.choices(RANDOM_ID_ALPHABET, k=9))
     
     return {
-        'id': fake_id,
-        'name': random.choice(fake_names),  # Frontend expects 'name'
-        'comment': random.choice(fake_comments),  # Frontend expects 'comment'
-        'rating': random.randint(4, 5),  # Frontend expects 'rating'
-        'created_at': random_time,
+        'id': f"fake_{now_ms}_{random_suffix}",
+        'name': f"{rng.choice(FAKE_FIRST_NAMES)} {rng.choice(FAKE_LAST_NAMES)}",  # Frontend expects 'name'
+        'comment': rng.choice(FAKE_COMMENTS) + rng.choice(FAKE_COMMENT_FOLLOWUPS),  # Frontend expects 'comment'
+        'rating': rng.randint(4, 5),  # Frontend expects 'rating'
+        'created_at': now_ms - rng.randint(0, 86400000),  # Random timestamp within last 24 hours
         'silent_discard': True
     }
 
-def is_bot_request(headers):
-    """Detect if request is from a bot based on WAF headers and User-Agent"""
+class DecoyPool:
+    """Pre-serialized fake comments served to bots.
+    
+    Each entry is stored as JSON fragments around the two per-request values (the
+    ID timestamp and created_at), so a response is assembled by indexed selection
+    and string joins, with created_at rolling forward relative to the request time.
+    """
+    
+    def __init__(self, entries):
+        # Each entry is (everything between the ID timestamp and the created_at value, age in ms)
+        self._entries = entries
+        if not self._entries:
+            raise ValueError('Decoy pool is empty')
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    @staticmethod
+    def _entry(suffix, name_json, comment_json, rating, age_ms):
+        return (f'_{suffix}","name":{name_json},"comment":{comment_json},"rating":{rating},"created_at":', age_ms)
+    
+    @classmethod
+    def generate(cls, size, seed=None):
+        """Build a pool of size randomly generated comments.
+        
+        Names and comments are JSON-escaped once up front, which keeps building a
+        few thousand entries cheap enough for the first bot request after a cold start.
+        """
+        rng = random.Random(seed)
+        uniform = rng.random
+        names = [json.dumps(f"{first} {last}") for first in FAKE_FIRST_NAMES for last in FAKE_LAST_NAMES]
+        comments = [json.dumps(comment + followup) for comment in FAKE_COMMENTS for followup in FAKE_COMMENT_FOLLOWUPS]
+        suffix_chars = rng.randbytes(9 * size).translate(_RANDOM_ID_BYTE_TABLE).decode('ascii')
+        return cls([
+            cls._entry(
+                suffix_chars[index * 9:index * 9 + 9],
+                names[int(uniform() * len(names))],
+                comments[int(uniform() * len(comments))],
+                4 + (uniform() < 0.5),
+                int(uniform() * 86400000)  # Random timestamp within last 24 hours
+            )
+            for index in range(size)
+        ])
+    
+    @classmethod
+    def load(cls, path):
+        """Build a pool from a JSON array of {"name", "comment", "rating"} objects"""
+        with open(path, encoding='utf-8') as pool_file:
+            comments = json.load(pool_file)
+        return cls([
+            cls._entry(
+                ''.join(random.choices(RANDOM_ID_ALPHABET, k=9)),
+                json.dumps(comment['name']),
+                json.dumps(comment['comment']),
+                int(comment.get('rating', 5)),
+                random.randint(0, 86400000)
+            )
+            for comment in comments
+        ])
+    
+    def render(self, count, now_ms=None):
+        """Return a JSON array string of count consecutive entries from a random offset"""
+        now = str(now_ms if now_ms is not None else int(time.time() * 1000))
+        now_int = int(now)
+        size = len(self._entries)
+        start = random.randrange(size)
+        parts = []
+        for offset in range(min(count, size)):
+            head, age_ms = self._entries[(start + offset) % size]
+            parts.append(f'{{"id":"fake_{now}{head}{now_int - age_ms},"silent_discard":true}}')
+        return f"[{','.join(parts)}]"
+
+_decoy_pool = None
+
+def get_decoy_pool():
+    """Return the container's decoy pool, building it on first use"""
+    global _decoy_pool
+    if _decoy_pool is None:
+        if DECOY_POOL_PATH:
+            try:
+                _decoy_pool = DecoyPool.load(DECOY_POOL_PATH)
+            except (OSError, ValueError, KeyError, TypeError) as error:
+                request_log.warning('Failed to load decoy pool, generating one', path=DECOY_POOL_PATH, error=str(error))
+        if _decoy_pool is None:
+            _decoy_pool = DecoyPool.generate(DECOY_POOL_SIZE)
+    return _decoy_pool
+
+def _build_pattern_trie(patterns):
+    """Build a character trie, pruning branches below a complete pattern"""
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for char in pattern:
+            if '' in node:
+                break  # A shorter pattern already matches this prefix
+            node = node.setdefault(char, {})
+        else:
+            node.clear()
+            node[''] = True
+    return trie
+
+def _trie_to_regex(node):
+    """Render a trie node as a regex fragment with one branch per distinct character"""
+    if '' in node:
+        return ''
+    
+    branches = []
+    leaf_chars = []
+    for char in sorted(node):
+        fragment = _trie_to_regex(node[char])
+        if fragment:
+            branches.append(re.escape(char) + fragment)
+        else:
+            leaf_chars.append(re.escape(char))
+    
+    if leaf_chars:
+        branches.append(leaf_chars[0] if len(leaf_chars) == 1 else f"[{''.join(leaf_chars)}]")
     
-    # Primary detection: Check WAF bot control headers
-    # WAF adds 'targeted-bot-detected: true' which CloudFront forwards as 'x-amzn-waf-targeted-bot-detected'
-    waf_bot_detected = (
-        headers.get('x-amzn-waf-targeted-bot-detected', '').lower() == 'true' or
-        headers.get('targeted-bot-detected', '').lower() == 'true'
+    return branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+
+def compile_user_agent_matcher(patterns):
+    """Compile User-Agent substring patterns into a single trie-shaped regex.
+    
+    The regex branches on one character at a time, so matching cost depends on
+    the pattern depth rather than the number of patterns.
+    """
+    trie = _build_pattern_trie(pattern.lower() for pattern in patterns if pattern)
+    if not trie:
+        return re.compile(r'(?!)')  # Never matches
+    return re.compile(_trie_to_regex(trie))
+
+_USER_AGENT_BOT_REGEX = compile_user_agent_matcher(BOT_USER_AGENT_PATTERNS)
+
+@lru_cache(maxsize=UA_VERDICT_CACHE_SIZE)
+def match_bot_user_agent(user_agent):
+    """Return the bot pattern matched by a raw User-Agent, or None (LRU cached)"""
+    match = _USER_AGENT_BOT_REGEX.search(user_agent.lower())
+    return match.group(0) if match else None
+
+@lru_cache(maxsize=UA_VERDICT_CACHE_SIZE)
+def user_agent_profile(user_agent):
+    """Return (matched bot pattern, headless, claims a browser) for a raw User-Agent (LRU cached)"""
+    pattern = match_bot_user_agent(user_agent)
+    lowered = user_agent.lower()
+    return pattern, HEADLESS_USER_AGENT_REGEX.search(lowered) is not None, pattern is None and lowered.startswith('mozilla/')
+
+def _has_waf_label(headers):
+    # One substring search over the joined names rules out nearly every request
+    if 'x-amzn-waf-' not in ' '.join(headers):
+        return False
+    return any(
+        name.startswith('x-amzn-waf-') and name != 'x-amzn-waf-targeted-bot-detected' and value.lower() not in ('', 'false')
+        for name, value in headers.items()
     )
+
+# Signal checks over the per-request facts built by score_request, keyed by rule name
+BOT_SIGNALS = {
+    # WAF adds 'targeted-bot-detected: <WAF_BOT_HEADER_VALUE>' which CloudFront forwards as 'x-amzn-waf-targeted-bot-detected'
+    'waf-targeted': lambda facts: (
+        facts['headers'].get('x-amzn-waf-targeted-bot-detected', '').lower() == WAF_BOT_HEADER_VALUE or
+        facts['headers'].get('targeted-bot-detected', '').lower() == WAF_BOT_HEADER_VALUE
+    ),
+    'edge-bot-flag': lambda facts: facts['headers'].get('x-bot-detected', '').lower() == 'true',
+    'ua-automation': lambda facts: facts['ua_pattern'] is not None and facts['ua_pattern'] not in CRAWLER_USER_AGENT_PATTERNS,
+    'ua-crawler': lambda facts: facts['ua_pattern'] in CRAWLER_USER_AGENT_PATTERNS,
+    'rapid-submissions': lambda facts: SUBMISSION_RATE_LIMIT > 0 and facts['submissions'] > SUBMISSION_RATE_LIMIT,
+    'fleet-rate': lambda facts: FLEET_RATE_LIMIT > 0 and facts['fleet_hits'] > FLEET_RATE_LIMIT,
+    'blocklisted': lambda facts: facts['blocklisted'],
+    'ua-headless': lambda facts: facts['ua_headless'],
+    'ua-missing': lambda facts: not facts['user_agent'],
+    'hosting-range': lambda facts: facts['hosting_range'] is not None,
+    'waf-label': lambda facts: _has_waf_label(facts['headers']),
+    'no-accept-language': lambda facts: facts['ua_browser'] and 'accept-language' not in facts['headers'],
+    'no-fetch-metadata': lambda facts: facts['ua_browser'] and 'sec-fetch-mode' not in facts['headers'],
+    'no-accept': lambda facts: 'accept' not in facts['headers'],
+    'proxy-chain': lambda facts: 'x-real-ip' in facts['headers'] or facts['headers'].get('x-forwarded-for', '').count(',') > TRUSTED_PROXY_HOPS
+}
+
+class BotScorer:
+    """Weighted bot score over a declarative rule table, compiled once at import.
     
-    if waf_bot_detected:
-        print(f"🤖 WAF Bot Detection: Bot detected via WAF headers")
-        return True
+    The rules become a flat tuple of signal checks whose results set bits in a
+    reason bitmask, and per-byte lookup tables that turn the bitmask into a score
+    with one table read per 8 rules.
+    """
     
-    # Secondary detection: Check User-Agent patterns for basic bots
-    user_agent = headers.get('user-agent', '').lower()
-    bot_patterns = [
-        'bot', 'crawler', 'spider', 'scraper', 'curl', 'wget', 'python', 'java',
-        'googlebot', 'bingbot', 'slurp', 'duckduckbot', 'baiduspider', 'yandexbot',
-        'facebookexternalhit', 'twitterbot', 'linkedinbot', 'whatsapp', 'telegram'
-    ]
-    
-    user_agent_bot = any(pattern in user_agent for pattern in bot_patterns)
-    if user_agent_bot:
-        print(f"🤖 User-Agent Bot Detection: Bot detected via User-Agent: {user_agent}")
-        return True
+    def __init__(self, rules, signals, weight_overrides=None):
+        weights = {name: weight for name, weight in rules}
+        for name, weight in (weight_overrides or {}).items():
+            if name not in weights:
+                # A typo in BOT_SCORE_WEIGHTS must not stop every cold start
+                request_log.warning('Ignoring unknown bot score rule', rule=name)
+                continue
+            weights[name] = weight
+        self.names = tuple(weights)
+        self.weights = tuple(weights.values())
+        self.checks = tuple(signals[name] for name in self.names)
+        self.byte_tables = tuple(
+            tuple(
+                sum(self.weights[base + bit] for bit in range(8) if value >> bit & 1 and base + bit < len(self.weights))
+                for value in range(256)
+            )
+            for base in range(0, len(self.weights), 8)
+        )
+    
+    def evaluate(self, facts):
+        """Return (score, reason bitmask) for one request"""
+        mask = 0
+        for bit, check in enumerate(self.checks):
+            if check(facts):
+                mask |= 1 << bit
+        return self.score(mask), mask
+    
+    def score(self, mask):
+        """Score for a reason bitmask"""
+        score = 0
+        for shift, table in enumerate(self.byte_tables):
+            score += table[(mask >> (shift * 8)) & 0xFF]
+        return score
+    
+    def mask_of(self, names):
+        """Reason bitmask with the bits of the named rules set"""
+        return sum(1 << bit for bit, name in enumerate(self.names) if name in names)
+    
+    def reasons(self, mask):
+        """Names of the rules set in a reason bitmask"""
+        return [name for bit, name in enumerate(self.names) if mask >> bit & 1]
+
+def parse_score_weights(spec):
+    """Parse 'rule=weight,...' into a dict of integer weights"""
+    weights = {}
+    for entry in spec.split(','):
+        name, _, weight = entry.partition('=')
+        try:
+            weights[name.strip()] = int(weight)
+        except ValueError:
+            continue
+    return weights
+
+BOT_SCORER = BotScorer(BOT_SCORE_RULES, BOT_SIGNALS, parse_score_weights(BOT_SCORE_WEIGHTS))
+
+# Signals read from headers any client can send itself. They still count toward the
+# score, but a verdict only becomes sticky if it holds without them, so nobody can pin
+# a verdict on a fingerprint they share with someone else. The WAF and edge flags are
+# not among them: WAF inserts a secret value and the CloudFront function overwrites
+# x-bot-detected and drops client copies of the WAF header
+CLIENT_ASSERTED_SIGNALS = frozenset(('waf-label', 'proxy-chain'))
+STICKY_SIGNAL_MASK = ~BOT_SCORER.mask_of(CLIENT_ASSERTED_SIGNALS)
+
+def score_request(headers, source_ip=None, submission=False):
+    """Score a request's bot likelihood from its headers and request rates; returns (score, reason bitmask)"""
+    user_agent = headers.get('user-agent', '')
+    ua_pattern, ua_headless, ua_browser = user_agent_profile(user_agent)
+    ua_hash = hash_user_agent(user_agent)
+    client = f"{source_ip}|{ua_hash}"
+    facts = {
+        'headers': headers,
+        'user_agent': user_agent,
+        'ua_pattern': ua_pattern,
+        'ua_headless': ua_headless,
+        'ua_browser': ua_browser,
+        # Submissions count toward the per-container POST rate; every request toward the fleet rate
+        'submissions': submission_tracker.hit(client) if submission and SUBMISSION_RATE_LIMIT > 0 else 0,
+        'fleet_hits': fleet_counter.add(client) if source_ip and fleet_counter.enabled else 0,
+        'blocklisted': blocklist is not None and any(key in blocklist for key in blocklist_keys(source_ip, ua_hash)),
+        'hosting_range': hosting_range_for(source_ip)
+    }
+    score, mask = BOT_SCORER.evaluate(facts)
+    if mask:
+        request_log.annotate(botScore=score, botSignals=mask)
+    if facts['hosting_range'] is not None:
+        request_log.annotate(hostingRange=facts['hosting_range'])
+    return score, mask
+
+def bot_tier(score):
+    """Deception tier for a bot score: 'bot', 'suspect' or 'human'"""
+    if score >= BOT_SCORE_THRESHOLD:
+        return 'bot'
+    return 'suspect' if score >= BOT_SCORE_SUSPECT else 'human'
+
+def client_fingerprint(headers, source_ip):
+    """Sticky verdict key: source IP, User-Agent hash and the first TLS fingerprint header present"""
+    fingerprint = f"{source_ip}|{hash_user_agent(headers.get('user-agent', ''))}"
+    tls = next((headers[name] for name in VERDICT_FINGERPRINT_HEADERS if headers.get(name)), None)
+    return f"{fingerprint}|{tls}" if tls else fingerprint
+
+def classify_request(headers, source_ip=None, submission=False):
+    """Score a request, record the verdict and return its deception tier"""
+    fingerprint = client_fingerprint(headers, source_ip) if source_ip and verdict_cache.enabled else None
+    sticky = verdict_cache.get(fingerprint, fetch=False) if fingerprint else None
+    if sticky == 'bot':
+        # Known bots skip scoring and rate tracking entirely
+        request_log.set_verdict('bot', 'sticky')
+        return 'bot'
+    score, mask = score_request(headers, source_ip, submission)
+    tier = bot_tier(score)
+    reasons = BOT_SCORER.reasons(mask)
+    if fingerprint and sticky is None and tier == 'human':
+        # Only requests that would pass pay for the fleet-wide lookup
+        sticky = verdict_cache.get(fingerprint)
+    if sticky is not None and VerdictCache.TIER_RANK[sticky] > VerdictCache.TIER_RANK[tier]:
+        tier = sticky
+        reasons.append('sticky')
+    elif fingerprint and tier != 'human':
+        trusted_tier = bot_tier(BOT_SCORER.score(mask & STICKY_SIGNAL_MASK))
+        if trusted_tier != 'human':
+            verdict_cache.record(fingerprint, trusted_tier)
+    request_log.set_verdict(tier, ','.join(reasons) or None)
+    return tier
+
+def is_bot_request(headers, source_ip=None, submission=False):
+    """Detect if request is from a bot based on its weighted bot score"""
+    return classify_request(headers, source_ip, submission) == 'bot'
+
+
+
+class RequestContext:
+    """Per-request view of a Lambda event, built once and passed to every handler.
+    
+    Headers are normalized lazily (lower-cased names, multiValueHeaders merged), and
+    the source IP, query parameters, parsed body and bot verdict are each computed
+    at most once, whichever event source (ALB, API Gateway v1/v2, Function URL)
+    the request came from.
+    """
+    
+    def __init__(self, event):
+        self.event = event
+        self.method, self.path = get_method_and_path(event)
+        self.path_params = {}
+        self._tier = None
+    
+    @cached_property
+    def headers(self):
+        headers = {name.lower(): value for name, value in (self.event.get('headers') or {}).items() if value is not None}
+        for name, values in (self.event.get('multiValueHeaders') or {}).items():
+            if values:
+                headers[name.lower()] = ', '.join(values)
+        return headers
     
-    # Additional behavioral detection for sophisticated bots
-    # Check for rapid submission patterns or suspicious headers
-    suspicious_headers = [
-        'x-forwarded-for',  # Multiple proxy chains
-        'x-real-ip',        # Proxy indicators
-        'x-bot-detected'    # Custom bot markers
-    ]
+    @cached_property
+    def query(self):
+        multi_value = self.event.get('multiValueQueryStringParameters') or {}
+        return self.event.get('queryStringParameters') or {name: values[-1] for name, values in multi_value.items() if values}
     
-    # Log for debugging but don't block based on these alone
-    if any(header in headers for header in suspicious_headers):
-        print(f"🔍 Suspicious headers detected: {[h for h in suspicious_headers if h in headers]}")
+    @cached_property
+    def source_ip(self):
+        """Client IP from API Gateway v1/v2 request context, or the trusted X-Forwarded-For hop (ALB)"""
+        request_context = self.event.get('requestContext') or {}
+        source_ip = (
+            (request_context.get('identity') or {}).get('sourceIp') or
+            (request_context.get('http') or {}).get('sourceIp')
+        )
+        if source_ip:
+            return source_ip
+        # Counted from the right: entries left of the trusted proxies are whatever the client sent
+        hops = [hop.strip() for hop in self.headers.get('x-forwarded-for', '').split(',') if hop.strip()]
+        if not hops:
+            return None
+        return hops[-1 - TRUSTED_PROXY_HOPS] if len(hops) > TRUSTED_PROXY_HOPS else hops[-1]
     
-    print(f"✅ Legitimate User: No bot indicators found. User-Agent: {user_agent}")
-    return False
+    @cached_property
+    def user_agent(self):
+        return self.headers.get('user-agent', '')
+    
+    @cached_property
+    def body(self):
+        raw = self.event.get('body')
+        if raw and self.event.get('isBase64Encoded'):
+            raw = base64.b64decode(raw).decode('utf-8', 'replace')
+        return parse_body(raw, self.headers.get('content-type'))
+    
+    def tier(self, submission=False):
+        """Deception tier for the request, computed once (submissions also count toward the POST rate)"""
+        if self._tier is None:
+            self._tier = classify_request(self.headers, self.source_ip, submission)
+        return self._tier
+    
+    def is_bot(self, submission=False):
+        return self.tier(submission) == 'bot'
 
+def comment_namespace(request):
+    """Return the demo namespace of a routed comments request ('/api/bot-demo-2/comments' -> 'bot-demo-2')"""
+    return request.path_params.get('demo', FEED_BUCKET_PREFIX)
 
+def parse_page_size(value):
+    """Parse a 'limit' query parameter, clamped to [1, MAX_PAGE_SIZE]"""
+    try:
+        return min(max(int(value), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+
+def build_comment_item(fields, source_ip, user_agent):
+    """Validate submitted comment fields and build the stored item, or return None if required fields are missing"""
+    # Support both field name formats for compatibility
+    name = fields.get('name') or fields.get('commenter')
+    comment = fields.get('comment') or fields.get('details')
+    rating = fields.get('rating', 5)  # Default to 5 stars if not provided
+    
+    if not name or not comment:
+        return None
+    
+    # Canonical compact schema: each value is stored once under a short attribute name
+    return {
+        'id': generate_random_id(),
+        'timestamp': int(time.time() * 1000),
+        'n': str(name)[:100],
+        'c': str(comment)[:1000],
+        'r': int(rating) if isinstance(rating, (int, float, str)) and str(rating).isdigit() else 5,
+        'ip': source_ip,
+        'ua': user_agent
+    }
+
+def comment_from_item(item):
+    """Read adapter: return a stored comment (compact or legacy schema) with frontend-expected field names"""
+    return {
+        'id': item['id'],
+        'name': item.get('n') or item.get('name') or item.get('commenter') or 'Anonymous',
+        'comment': item.get('c') or item.get('comment') or item.get('details') or '',
+        'rating': item.get('r', item.get('rating', 5)),
+        'created_at': item.get('timestamp', item.get('created_at')),
+        'silent_discard': bool(item.get('sd', item.get('silent_discard', item.get('isFake', False))))
+    }
+
+def compact_comment_item(item):
+    """Rewrite a stored comment in the canonical compact schema, keeping its key attributes"""
+    comment = comment_from_item(item)
+    created_at = comment['created_at']
+    if created_at is None:
+        # timestamp is a GSI key and cannot be null; backfill it like migrate_comment_keys.py
+        created_at = int(time.time() * 1000)
+    compact = {
+        'id': comment['id'],
+        'timestamp': created_at,
+        'n': comment['name'],
+        'c': comment['comment'],
+        'r': comment['rating']
+    }
+    if comment['silent_discard']:
+        compact['sd'] = True  # Only stored when set; absence reads as False
+    for attribute, legacy in (('feed_bucket', None), ('ip', None), ('ua', 'userAgent')):
+        value = item.get(attribute, item.get(legacy))
+        if value is not None:
+            compact[attribute] = value
+    return compact
+
+def is_compact_comment_item(item):
+    """True if a stored comment already uses only the canonical compact schema"""
+    return 'n' in item and not LEGACY_COMMENT_ATTRIBUTES.intersection(item)
 
 def generate_random_id():
     """Generate a random ID for comments"""
     random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=9))
     return f"{int(time.time() * 1000)}_{random_suffix}"
 
+# Base flight data (matches original SSR logic)
+FLIGHT_CATALOG = (
+    {
+        'id': 1,
+        'route': 'New York → London',
+        'airline': 'SkyWings',
+        'departure': '10:30 AM',
+        'arrival': '10:30 PM',
+        'duration': '7h 0m',
+        'originalPrice': 1299,
+        'baseDiscount': 31
+    },
+    {
+        'id': 2,
+        'route': 'Los Angeles → Tokyo',
+        'airline': 'PacificAir',
+        'departure': '2:15 PM',
+        'arrival': '5:30 PM (next day)',
+        'duration': '11h 15m',
+        'originalPrice': 1899,
+        'baseDiscount': 32
+    },
+    {
+        'id': 3,
+        'route': 'Chicago → Paris',
+        'airline': 'EuroConnect',
+        'departure': '8:45 PM',
+        'arrival': '11:20 AM (next day)',
+        'duration': '8h 35m',
+        'originalPrice': 1499,
+        'baseDiscount': 27
+    },
+    {
+        'id': 4,
+        'route': 'Miami → Barcelona',
+        'airline': 'Mediterranean Air',
+        'departure': '11:20 AM',
+        'arrival': '5:45 AM (next day)',
+        'duration': '9h 25m',
+        'originalPrice': 1699,
+        'baseDiscount': 29
+    },
+    {
+        'id': 5,
+        'route': 'Seattle → Sydney',
+        'airline': 'Pacific Rim',
+        'departure': '10:00 PM',
+        'arrival': '6:30 AM (2 days later)',
+        'duration': '16h 30m',
+        'originalPrice': 2499,
+        'baseDiscount': 24
+    },
+    {
+        'id': 6,
+        'route': 'Boston → Rome',
+        'airline': 'Italian Wings',
+        'departure': '6:30 PM',
+        'arrival': '9:15 AM (next day)',
+        'duration': '8h 45m',
+        'originalPrice': 1599,
+        'baseDiscount': 25
+    }
+)
+
+def price_flights(catalog, is_bot):
+    """Apply bot-specific pricing to a flight catalog"""
+    flights = []
+    for flight in catalog:
+        if is_bot:
+            # Bots see inflated prices (original price)
+            flights.append({**flight, 'price': flight['originalPrice'], 'discount': 0, 'available': True})
+        else:
+            # Normal users see discounted prices
+            discounted_price = int(flight['originalPrice'] * (100 - flight['baseDiscount']) / 100)
+            flights.append({**flight, 'price': discounted_price, 'discount': flight['baseDiscount'], 'available': True})
+    return flights
+
+def build_flight_bodies(catalog):
+    """Serialize the bot and human flight responses for a catalog"""
+    bodies = {}
+    for variant in ('bot', 'human'):
+        flights = price_flights(catalog, variant == 'bot')
+        bodies[variant] = json.dumps({
+            'flights': flights,
+            'total': len(flights),
+            'message': 'Flight data retrieved successfully'
+        }, cls=DecimalEncoder)
+    return bodies
+
+_flight_bodies = build_flight_bodies(FLIGHT_CATALOG)
+_flight_catalog_state = {'mtime': None, 'checked_at': None}
+
+def reload_flight_catalog(path=None):
+    """Rebuild the prebuilt flight bodies from a JSON catalog file, or the bundled catalog"""
+    global _flight_bodies
+    if path:
+        with open(path, encoding='utf-8') as catalog_file:
+            catalog = json.load(catalog_file)
+        _flight_catalog_state['mtime'] = os.stat(path).st_mtime
+    else:
+        catalog = FLIGHT_CATALOG
+    _flight_bodies = build_flight_bodies(catalog)
+    return _flight_bodies
+
+@lru_cache(maxsize=8)
+def flight_etag(body):
+    """Strong ETag of a prebuilt flight body, hashed once per catalog load"""
+    return f'"f{hashlib.blake2b(body.encode("utf-8"), digest_size=8).hexdigest()}"'
+
+def get_flight_bodies():
+    """Return the prebuilt flight bodies, reloading FLIGHT_CATALOG_PATH when the file changes"""
+    if FLIGHT_CATALOG_PATH:
+        now = time.monotonic()
+        state = _flight_catalog_state
+        # A catalog that failed to load is retried on the same interval, not on every request
+        if state['checked_at'] is None or now - state['checked_at'] >= FLIGHT_CATALOG_CHECK_INTERVAL:
+            state['checked_at'] = now
+            try:
+                if os.stat(FLIGHT_CATALOG_PATH).st_mtime != state['mtime']:
+                    reload_flight_catalog(FLIGHT_CATALOG_PATH)
+            except (OSError, ValueError, KeyError, TypeError) as error:
+                request_log.warning('Failed to reload flight catalog', path=FLIGHT_CATALOG_PATH, error=str(error))
+    return _flight_bodies
+
+# Static responses: built once per container and returned as shallow copies.
+# The shared headers and body must be treated as read-only.
+STATIC_RESPONSES = {}
+
+def register_static_response(name, status_code, body, headers):
+    """Register a precomputed response under name"""
+    STATIC_RESPONSES[name] = {'statusCode': status_code, 'headers': headers, 'body': body}
+
+def static_response(name):
+    """Return a registered static response"""
+    return dict(STATIC_RESPONSES[name])
+
+TEXT_HEADERS = {
+    'Content-Type': 'text/plain',
+    'Access-Control-Allow-Origin': '*'
+}
+
+# Provide real robots.txt for legitimate users
+register_static_response('robots-human', 200, """User-agent: *
+Disallow: /api/
+Disallow: /admin/
+Allow: /
+
+Crawl-delay: 10""", TEXT_HEADERS)
+
+register_static_response('options', 200, '{}', {
+    **DEFAULT_HEADERS,
+    'Access-Control-Max-Age': str(CORS_MAX_AGE)  # Let browsers cache preflights
+})
+
+@lru_cache(maxsize=64)
+def _bot_robots_response(host):
+    """Fake robots.txt for bots; the only per-request part is the Host header"""
+    return {
+        'statusCode': 200,
+        'headers': TEXT_HEADERS,
+        'body': f"""User-agent: *
+Allow: /
+Allow: /api/
+Allow: /comments
+Crawl-delay: 1
+
+Sitemap: https://{host}/sitemap.xml"""
+    }
+
+# Everything in the health body except the timestamp is fixed per container
+_HEALTH_BODY_PREFIX = json.dumps({
+    'status': 'healthy',
+    'environment': 'lambda',
+    'region': AWS_REGION,
+    'functionName': os.environ.get('AWS_LAMBDA_FUNCTION_NAME'),
+    'functionVersion': os.environ.get('AWS_LAMBDA_FUNCTION_VERSION'),
+    'memory': os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE'),
+    'database': {
+        'type': db.BACKEND_NAME,
+        'tableName': TABLE_NAME,
+        'region': AWS_REGION
+    }
+})[:-1] + ', "timestamp": '
+
+def is_warmup_event(event):
+    """Scheduled pings: {"warmup": true} or an EventBridge scheduled event"""
+    return bool(event.get('warmup')) or event.get('detail-type') == 'Scheduled Event'
+
+def handle_warmup(request):
+    """Pre-touch the storage client and per-container caches"""
+    started = time.perf_counter()
+    warmed = {
+        'storage': db.warm_up(),
+        'decoyPool': len(get_decoy_pool()),
+        'blocklist': len(blocklist) if blocklist is not None else None,
+        'hostingRanges': len(hosting_ranges) if hosting_ranges is not None else None,
+        'flightBodies': len(get_flight_bodies())
+    }
+    request_log.annotate(warmed=warmed)
+    return {
+        'warmed': warmed,
+        'durationMs': round((time.perf_counter() - started) * 1000, 3)
+    }
+
 # Route handlers
-def handle_health(event):
+def handle_health(request):
     """Health check endpoint"""
-    return send_response(200, {
-        'status': 'healthy',
-        'timestamp': datetime.now(timezone.utc).isoformat(),
-        'environment': 'lambda',
-        'region': AWS_REGION,
-        'functionName': os.environ.get('AWS_LAMBDA_FUNCTION_NAME'),
-        'functionVersion': os.environ.get('AWS_LAMBDA_FUNCTION_VERSION'),
-        'memory': os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE'),
-        'database': {
-            'type': 'DynamoDB',
-            'tableName': TABLE_NAME,
-            'region': AWS_REGION
-        }
-    })
+    return send_serialized_response(200, f'{_HEALTH_BODY_PREFIX}"{datetime.now(timezone.utc).isoformat()}"}}')
 
-def handle_status(event):
+def handle_status(request):
     """Bot detection status endpoint"""
-    headers = event.get('headers', {})
-    is_bot = is_bot_request(headers)
+    request.is_bot()
     
     # Don't reveal bot detection to potential bots
-    user_agent = headers.get('user-agent', 'Unknown')
-    
     return send_response(200, {
         'message': 'Hello',
         'timestamp': datetime.now(timezone.utc).isoformat(),
-        'userAgent': user_agent,
-        'ip': event.get('requestContext', {}).get('identity', {}).get('sourceIp', 'Unknown')
+        'userAgent': request.user_agent or 'Unknown',
+        'ip': request.source_ip or 'Unknown'
     })
 
-def handle_get_comments(event):
+def handle_get_comments(request):
     """Get comments endpoint with bot deception"""
-    headers = event.get('headers', {})
-    is_bot = is_bot_request(headers)
-    
-    # Log the request for debugging
-    user_agent = headers.get('user-agent', 'Unknown')
-    source_ip = event.get('requestContext', {}).get('identity', {}).get('sourceIp', 'Unknown')
-    waf_header = headers.get('x-amzn-waf-targeted-bot-detected', 'Not present')
-    
-    print(f"📖 Get Comments Request:")
-    print(f"   IP: {source_ip}")
-    print(f"   User-Agent: {user_agent}")
-    print(f"   WAF Bot Header: {waf_header}")
-    print(f"   Bot Detected: {is_bot}")
-    
     try:
-        if is_bot:
+        if request.is_bot():
             # Return fake comments for bots
-            print(f"🎭 BOT DECEPTION: Serving fake comments to bot")
-            fake_comments = [generate_fake_comment() for _ in range(5)]
-            return send_response(200, {
-                'comments': fake_comments,
-                'total': len(fake_comments),
-                'message': 'Comments retrieved successfully'
-            })
+            request_log.annotate(action='fake-comments')
+            decoy_pool = get_decoy_pool()
+            total = min(DECOY_COMMENTS_PER_RESPONSE, len(decoy_pool))
+            return send_serialized_response(
+                200,
+                f'{{"comments":{decoy_pool.render(total)},"total":{total},"message":"Comments retrieved successfully"}}'
+            )
         else:
             # Return real comments for legitimate users
-            print(f"✅ LEGITIMATE USER: Serving real comments")
-            raw_comments = db.get_items(50)
+            params = request.query
+            limit = parse_page_size(params.get('limit'))
+            cursor = urllib.parse.unquote(params['cursor']) if params.get('cursor') else None
             
-            # Transform field names to match frontend expectations
-            transformed_comments = []
-            for comment in raw_comments:
-                transformed_comment = {
-                    'id': comment.get('id'),
-                    'name': comment.get('name', comment.get('commenter', 'Anonymous')),  # Frontend expects 'name'
-                    'comment': comment.get('comment', comment.get('details', '')),  # Frontend expects 'comment'
-                    'rating': comment.get('rating', 5),  # Frontend expects 'rating'
-                    'created_at': comment.get('timestamp', comment.get('created_at', int(time.time() * 1000))),
-                    'silent_discard': comment.get('isFake', comment.get('silent_discard', False)),
-                    'ip': comment.get('ip', 'Unknown'),
-                    'userAgent': comment.get('userAgent', 'Unknown')
-                }
-                transformed_comments.append(transformed_comment)
+            # Read the version before the page, so a write racing this read moves the tag on
+            version = feed_version.current()
+            etag = f'"c{version}-{zlib.crc32(f"{limit}|{cursor}".encode("utf-8")):08x}"' if version is not None else None
+            if etag is not None and etag_matches(request, etag):
+                return send_not_modified(etag)
+            
+            try:
+                raw_comments, next_cursor = db.get_page(limit, cursor, comment_namespace(request), version)
+            except ValueError:
+                return send_response(400, {
+                    'error': 'Invalid cursor'
+                })
+            
+            # Only the projected fields are read; the adapter handles compact and legacy items
+            transformed_comments = [comment_from_item(comment) for comment in raw_comments]
             
             return send_response(200, {
                 'comments': transformed_comments,
                 'total': len(transformed_comments),
+                'nextCursor': next_cursor,
                 'message': 'Comments retrieved successfully'
-            })
+            }, etag_headers(etag) if etag is not None else None)
     except Exception as error:
-        print(f'Error getting comments: {error}')
+        request_log.error('Error getting comments', error=str(error))
         return send_response(500, {
             'error': 'Failed to retrieve comments',
             'message': str(error)
         })
 
-def handle_post_comments(event):
+def handle_post_comments(request):
     """Add new comment endpoint"""
-    headers = event.get('headers', {})
-    is_bot = is_bot_request(headers)
-    
-    # Log the request for debugging
-    user_agent = headers.get('user-agent', 'Unknown')
-    source_ip = event.get('requestContext', {}).get('identity', {}).get('sourceIp', 'Unknown')
-    waf_header = headers.get('x-amzn-waf-targeted-bot-detected', 'Not present')
-    
-    print(f"📝 Comment Submission Request:")
-    print(f"   IP: {source_ip}")
-    print(f"   User-Agent: {user_agent}")
-    print(f"   WAF Bot Header: {waf_header}")
-    print(f"   Bot Detected: {is_bot}")
-    
-    if is_bot:
+    tier = request.tier(submission=True)
+    if tier == 'bot':
         # SHADOW BAN: Pretend to accept the comment but don't actually store it
-        print(f"🚫 SHADOW BAN: Bot comment rejected silently")
+        request_log.annotate(action='shadow-ban')
         return send_response(200, {
             'message': 'Comment added successfully',
             'comment': {
@@ -313,49 +2373,28 @@ def handle_post_comments(event):
         })
     
     try:
-        body = parse_body(event.get('body'), event.get('headers', {}).get('content-type'))
+        body = request.body
         
-        # Support both field name formats for compatibility
-        name = body.get('name') or body.get('commenter')
-        comment = body.get('comment') or body.get('details')
-        rating = body.get('rating', 5)  # Default to 5 stars if not provided
+        new_comment = build_comment_item(body, request.source_ip or 'Unknown', request.user_agent or 'Unknown')
         
-        if not name or not comment:
+        if new_comment is None:
             return send_response(400, {
                 'error': 'Missing required fields',
                 'required': ['name/commenter', 'comment/details'],
                 'received': list(body.keys()) if body else []
             })
+        if tier == 'suspect':
+            new_comment['sd'] = True  # Stored but flagged for silent discard
         
-        # Store with both field name formats for maximum compatibility
-        new_comment = {
-            'id': generate_random_id(),
-            # Store both field name formats
-            'name': str(name)[:100],  # Frontend expected format
-            'commenter': str(name)[:100],  # Legacy format
-            'comment': str(comment)[:1000],  # Frontend expected format
-            'details': str(comment)[:1000],  # Legacy format
-            'rating': int(rating) if isinstance(rating, (int, float, str)) and str(rating).isdigit() else 5,  # Store rating
-            'timestamp': int(time.time() * 1000),  # Legacy format
-            'created_at': int(time.time() * 1000),  # Frontend expected format
-            'isFake': False,  # Legacy format
-            'silent_discard': False,  # Frontend expected format
-            'ip': event.get('requestContext', {}).get('identity', {}).get('sourceIp', 'Unknown'),
-            'userAgent': event.get('headers', {}).get('user-agent', 'Unknown')
-        }
-        
-        success = db.put_item(new_comment)
+        if write_queue is not None and tier == 'human' and write_queue.append(new_comment):
+            request_log.annotate(writeBehind=True, writeBehindQueued=len(write_queue))
+            success = True
+        else:
+            success = db.put_item(new_comment)
         
         if success:
             # Return response with frontend-expected field names
-            response_comment = {
-                'id': new_comment['id'],
-                'name': new_comment['name'],  # Frontend expects 'name'
-                'comment': new_comment['comment'],  # Frontend expects 'comment'
-                'rating': new_comment['rating'],  # Frontend expects 'rating'
-                'created_at': new_comment['created_at'],
-                'silent_discard': new_comment['silent_discard']
-            }
+            response_comment = comment_from_item(new_comment)
             
             return send_response(201, {
                 'message': 'Comment added successfully',
@@ -368,24 +2407,107 @@ def handle_post_comments(event):
                 'success': False
             })
     except Exception as error:
-        print(f'Error adding comment: {error}')
+        request_log.error('Error adding comment', error=str(error))
         return send_response(500, {
             'error': 'Failed to add comment',
             'message': str(error),
             'success': False
         })
 
-def handle_delete_comments(event):
-    """Delete comment endpoint (admin function)"""
-    is_bot = is_bot_request(event.get('headers', {}))
+def handle_post_comments_batch(request):
+    """Bulk comment ingestion endpoint backed by BatchWriteItem (admin function)"""
+    # One request can write BATCH_MAX_COMMENTS comments, so only admins may use it. Admin
+    # imports skip bot scoring and the submission rate; nothing else is ever stored
+    token = request.headers.get('x-admin-token', '')
+    authorized = bool(BATCH_ADMIN_TOKEN) and hmac.compare_digest(token.encode('utf-8'), BATCH_ADMIN_TOKEN.encode('utf-8'))
+    if authorized:
+        request_log.set_verdict('human', 'admin-token')
     
-    if is_bot:
+    try:
+        body = request.body
+        entries = body if isinstance(body, list) else body.get('comments') if isinstance(body, dict) else None
+        
+        if not authorized and request.is_bot(submission=True):
+            # SHADOW BAN: Report every comment as stored without writing anything, whatever was sent
+            count = min(len(entries), BATCH_MAX_COMMENTS) if isinstance(entries, list) else 0
+            request_log.annotate(action='shadow-ban', batchSize=count)
+            now_ms = int(time.time() * 1000)
+            return send_response(201, {
+                'message': 'Comments added successfully',
+                'stored': count,
+                'failed': 0,
+                'results': [
+                    {'index': index, 'status': 'stored', 'id': f"fake_{now_ms}_{index}"}
+                    for index in range(count)
+                ],
+                'success': True
+            })
+        
+        if not authorized:
+            # Everyone else sees the same 404 as an unknown route
+            request_log.annotate(action='batch-unauthorized')
+            return send_response(404, {
+                'error': 'Not Found',
+                'path': request.path,
+                'method': request.method,
+                'availableRoutes': ROUTER.route_keys
+            })
+        
+        if not isinstance(entries, list) or not entries:
+            return send_response(400, {
+                'error': 'Expected a non-empty array of comments',
+                'success': False
+            })
+        if len(entries) > BATCH_MAX_COMMENTS:
+            return send_response(413, {
+                'error': f'Too many comments in one batch (max {BATCH_MAX_COMMENTS})',
+                'success': False
+            })
+        
+        source_ip = request.source_ip or 'Unknown'
+        user_agent = request.user_agent or 'Unknown'
+        
+        # Validate with the same rules as single comments
+        results = []
+        valid_items = []
+        for index, entry in enumerate(entries):
+            item = build_comment_item(entry, source_ip, user_agent) if isinstance(entry, dict) else None
+            if item is None:
+                results.append({'index': index, 'status': 'invalid', 'error': 'Missing required fields'})
+            else:
+                results.append({'index': index, 'status': 'pending', 'id': item['id']})
+                valid_items.append((index, item))
+        
+        stored = db.put_items([item for _, item in valid_items])
+        for (index, _), ok in zip(valid_items, stored):
+            results[index]['status'] = 'stored' if ok else 'failed'
+        
+        stored_count = sum(stored)
+        request_log.annotate(batchSize=len(entries), batchStored=stored_count)
+        return send_response(201 if stored_count == len(entries) else 207, {
+            'message': f'Stored {stored_count} of {len(entries)} comments',
+            'stored': stored_count,
+            'failed': len(entries) - stored_count,
+            'results': results,
+            'success': stored_count == len(entries)
+        })
+    except Exception as error:
+        request_log.error('Error adding comment batch', error=str(error))
+        return send_response(500, {
+            'error': 'Failed to add comments',
+            'message': str(error),
+            'success': False
+        })
+
+def handle_delete_comments(request):
+    """Delete comment endpoint (admin function)"""
+    if request.is_bot():
         return send_response(200, {
             'message': 'Comment deleted successfully'
         })
     
     try:
-        body = parse_body(event.get('body'), event.get('headers', {}).get('content-type'))
+        body = request.body
         
         if not body.get('id'):
             return send_response(400, {
@@ -403,248 +2525,219 @@ def handle_delete_comments(event):
                 'error': 'Failed to delete comment'
             })
     except Exception as error:
-        print(f'Error deleting comment: {error}')
+        request_log.error('Error deleting comment', error=str(error))
         return send_response(500, {
             'error': 'Failed to delete comment',
             'message': str(error)
         })
 
-def handle_get_flights(event):
+def handle_get_flights(request):
     """Get flight data with bot-specific pricing"""
-    is_bot = is_bot_request(event.get('headers', {}))
-    
     try:
-        # Base flight data (matches original SSR logic)
-        base_flights = [
-            {
-                'id': 1,
-                'route': 'New York → London',
-                'airline': 'SkyWings',
-                'departure': '10:30 AM',
-                'arrival': '10:30 PM',
-                'duration': '7h 0m',
-                'originalPrice': 1299,
-                'baseDiscount': 31
-            },
-            {
-                'id': 2,
-                'route': 'Los Angeles → Tokyo',
-                'airline': 'PacificAir',
-                'departure': '2:15 PM',
-                'arrival': '5:30 PM (next day)',
-                'duration': '11h 15m',
-                'originalPrice': 1899,
-                'baseDiscount': 32
-            },
-            {
-                'id': 3,
-                'route': 'Chicago → Paris',
-                'airline': 'EuroConnect',
-                'departure': '8:45 PM',
-                'arrival': '11:20 AM (next day)',
-                'duration': '8h 35m',
-                'originalPrice': 1499,
-                'baseDiscount': 27
-            },
-            {
-                'id': 4,
-                'route': 'Miami → Barcelona',
-                'airline': 'Mediterranean Air',
-                'departure': '11:20 AM',
-                'arrival': '5:45 AM (next day)',
-                'duration': '9h 25m',
-                'originalPrice': 1699,
-                'baseDiscount': 29
-            },
-            {
-                'id': 5,
-                'route': 'Seattle → Sydney',
-                'airline': 'Pacific Rim',
-                'departure': '10:00 PM',
-                'arrival': '6:30 AM (2 days later)',
-                'duration': '16h 30m',
-                'originalPrice': 2499,
-                'baseDiscount': 24
-            },
-            {
-                'id': 6,
-                'route': 'Boston → Rome',
-                'airline': 'Italian Wings',
-                'departure': '6:30 PM',
-                'arrival': '9:15 AM (next day)',
-                'duration': '8h 45m',
-                'originalPrice': 1599,
-                'baseDiscount': 25
-            }
-        ]
-        
-        # Apply bot-specific pricing logic
-        flights = []
-        for flight in base_flights:
-            if is_bot:
-                # Bots see inflated prices (original price)
-                processed_flight = {
-                    **flight,
-                    'price': flight['originalPrice'],
-                    'discount': 0,
-                    'available': True
-                }
-            else:
-                # Normal users see discounted prices
-                discounted_price = int(flight['originalPrice'] * (100 - flight['baseDiscount']) / 100)
-                processed_flight = {
-                    **flight,
-                    'price': discounted_price,
-                    'discount': flight['baseDiscount'],
-                    'available': True
-                }
-            
-            flights.append(processed_flight)
-        
-        return send_response(200, {
-            'flights': flights,
-            'total': len(flights),
-            'message': 'Flight data retrieved successfully'
-        })
+        # Both pricing variants are serialized once per catalog load; suspects already get bot pricing
+        body = get_flight_bodies()['human' if request.tier() == 'human' else 'bot']
+        etag = flight_etag(body)
+        if etag_matches(request, etag):
+            return send_not_modified(etag)
+        return send_serialized_response(200, body, etag_headers(etag))
         
     except Exception as error:
-        print(f'Error getting flights: {error}')
+        request_log.error('Error getting flights', error=str(error))
         return send_response(500, {
             'error': 'Failed to retrieve flight data',
             'message': str(error)
         })
 
-def handle_robots_txt(event):
+def handle_robots_txt(request):
     """Robots.txt endpoint with bot deception"""
-    is_bot = is_bot_request(event.get('headers', {}))
-    
-    if is_bot:
+    if request.is_bot():
         # Provide fake robots.txt for bots
-        fake_robots = f"""User-agent: *
-Allow: /
-Allow: /api/
-Allow: /comments
-Crawl-delay: 1
-
-Sitemap: https://{event.get('headers', {}).get('host', 'example.com')}/sitemap.xml"""
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'text/plain',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': fake_robots
-        }
+        return dict(_bot_robots_response(request.headers.get('host', 'example.com')))
     else:
-        # Provide real robots.txt for legitimate users
-        real_robots = """User-agent: *
-Disallow: /api/
-Disallow: /admin/
-Allow: /
+        return static_response('robots-human')
 
-Crawl-delay: 10"""
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'text/plain',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': real_robots
-        }
-
-def handle_options(event):
+def handle_options(request):
     """Handle OPTIONS requests for CORS"""
-    return send_response(200, {}, {
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-    })
+    return static_response('options')
+
+# Route mapping ({demo} matches one of DEMO_NAMESPACES; OPTIONS is answered for every route)
+DEMO_NAMESPACES = ('bot-demo-2', 'pricing-demo-3')
 
-# Route mapping
 ROUTES = {
     'GET /health': handle_health,
     'GET /api/status': handle_status,
     'GET /api/comments': handle_get_comments,
     'POST /api/comments': handle_post_comments,
     'DELETE /api/comments': handle_delete_comments,
+    'POST /api/comments/batch': handle_post_comments_batch,
     # Demo-specific routes
-    'GET /api/bot-demo-2/comments': handle_get_comments,
-    'POST /api/bot-demo-2/comments': handle_post_comments,
-    'DELETE /api/bot-demo-2/comments': handle_delete_comments,
-    'GET /api/pricing-demo-3/comments': handle_get_comments,
-    'POST /api/pricing-demo-3/comments': handle_post_comments,
-    'DELETE /api/pricing-demo-3/comments': handle_delete_comments,
+    'GET /api/{demo}/comments': handle_get_comments,
+    'POST /api/{demo}/comments': handle_post_comments,
+    'DELETE /api/{demo}/comments': handle_delete_comments,
+    'POST /api/{demo}/comments/batch': handle_post_comments_batch,
     # Flight data routes
     'GET /api/pricing-demo-3/flights': handle_get_flights,
-    'GET /robots.txt': handle_robots_txt,
-    'OPTIONS': handle_options
+    'GET /robots.txt': handle_robots_txt
 }
 
-def lambda_handler(event, context):
-    """Main Lambda handler function"""
-    print(f'Event: {json.dumps(event, default=str)}')
+class _RouteNode:
+    __slots__ = ('static', 'param_name', 'param_values', 'param_child', 'handlers', 'pattern')
     
-    try:
-        # Handle ALB events
-        if event.get('requestContext', {}).get('elb'):
-            method = event.get('httpMethod')
-            path = event.get('path')
-            route_key = f"{method} {path}"
-            
-            print(f'Processing ALB request: {route_key}')
-            
-            # Find matching route
-            handler = ROUTES.get(route_key) or ROUTES.get(method) or ROUTES.get('OPTIONS')
-            
-            if handler:
-                result = handler(event)
-                print(f'Response: {json.dumps(result, default=str)}')
-                return result
+    def __init__(self):
+        self.static = {}
+        self.param_name = None
+        self.param_values = None
+        self.param_child = None
+        self.handlers = {}
+        self.pattern = None
+
+class Router:
+    """Segment trie of 'METHOD /path/{param}' routes, compiled once at import.
+    
+    Lookup walks one trie level per path segment, preferring static segments over
+    parameters. Parameters can be restricted to a set of allowed values.
+    """
+    
+    def __init__(self, routes, constraints=None):
+        self.root = _RouteNode()
+        self.constraints = {name: frozenset(values) for name, values in (constraints or {}).items()}
+        self.route_keys = list(routes)
+        for route_key, handler in routes.items():
+            method, pattern = route_key.split(' ', 1)
+            self.add(method, pattern, handler)
+    
+    @staticmethod
+    def split_path(path):
+        return [segment for segment in (path or '').split('/') if segment]
+    
+    def add(self, method, pattern, handler):
+        node = self.root
+        for segment in self.split_path(pattern):
+            if segment.startswith('{') and segment.endswith('}'):
+                name = segment[1:-1]
+                if node.param_child is None:
+                    node.param_name = name
+                    node.param_values = self.constraints.get(name)
+                    node.param_child = _RouteNode()
+                elif node.param_name != name:
+                    raise ValueError(f"Conflicting route parameters {{{node.param_name}}} and {segment} in {pattern}")
+                node = node.param_child
             else:
-                print(f'No handler found for route: {route_key}')
-                return send_response(404, {
-                    'error': 'Not Found',
-                    'path': path,
-                    'method': method,
-                    'availableRoutes': list(ROUTES.keys())
-                })
+                node = node.static.setdefault(segment, _RouteNode())
+        if method in node.handlers:
+            raise ValueError(f"Duplicate route: {method} {pattern}")
+        node.handlers[method] = handler
+        node.pattern = pattern
+    
+    def _walk(self, node, segments, index, params):
+        if index == len(segments):
+            return node if node.handlers else None
+        segment = segments[index]
+        child = node.static.get(segment)
+        if child is not None:
+            found = self._walk(child, segments, index + 1, params)
+            if found is not None:
+                return found
+        if node.param_child is not None and (node.param_values is None or segment in node.param_values):
+            params[node.param_name] = segment
+            found = self._walk(node.param_child, segments, index + 1, params)
+            if found is not None:
+                return found
+            del params[node.param_name]
+        return None
+    
+    def resolve(self, path):
+        """Return (route node, path parameters), or (None, {}) if no pattern matches"""
+        params = {}
+        node = self._walk(self.root, self.split_path(path), 0, params)
+        return node, params
+
+ROUTER = Router(ROUTES, constraints={'demo': DEMO_NAMESPACES})
+
+def get_method_and_path(event):
+    """Return (method, path) for ALB, API Gateway v1/v2 and Function URL events"""
+    http = event.get('requestContext', {}).get('http') or {}
+    method = event.get('httpMethod') or http.get('method')
+    path = event.get('path') or event.get('rawPath') or http.get('path')
+    return method, path
+
+def route_event(request):
+    """Dispatch an ALB, API Gateway or Function URL request to its route handler"""
+    try:
+        method, path = request.method, request.path
         
-        # Handle API Gateway events (if needed)
-        if event.get('requestContext', {}).get('apiId'):
-            method = event.get('httpMethod')
-            path = event.get('path')
-            route_key = f"{method} {path}"
-            
-            print(f'Processing API Gateway request: {route_key}')
-            
-            handler = ROUTES.get(route_key) or ROUTES.get(method) or ROUTES.get('OPTIONS')
-            
-            if handler:
-                return handler(event)
-            else:
-                return send_response(404, {
-                    'error': 'Not Found',
+        # Handle direct Lambda invocation
+        if not method or not path:
+            request_log.set_route('direct')
+            return send_response(200, {
+                'message': 'Bot Deception API is running',
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'environment': 'lambda'
+            })
+        
+        node, params = ROUTER.resolve(path)
+        if node is None:
+            return send_response(404, {
+                'error': 'Not Found',
+                'path': path,
+                'method': method,
+                'availableRoutes': ROUTER.route_keys
+            })
+        
+        handler = node.handlers.get(method)
+        if handler is None:
+            if method != 'OPTIONS':
+                return send_response(405, {
+                    'error': 'Method Not Allowed',
                     'path': path,
                     'method': method
-                })
+                }, {'Allow': ','.join([*node.handlers, 'OPTIONS'])})
+            handler = handle_options
         
-        # Handle direct Lambda invocation
-        print('Direct Lambda invocation')
-        return send_response(200, {
-            'message': 'Bot Deception API is running',
-            'timestamp': datetime.now(timezone.utc).isoformat(),
-            'environment': 'lambda'
-        })
+        request_log.set_route(f"{method} {node.pattern}")
+        request.path_params = params
+        return handler(request)
         
     except Exception as error:
-        print(f'Lambda Error: {error}')
+        request_log.error('Lambda Error', error=str(error))
         return send_response(500, {
             'error': 'Internal Server Error',
             'message': str(error),
             'timestamp': datetime.now(timezone.utc).isoformat()
         })
 
+def lambda_handler(event, context):
+    """Main Lambda handler function"""
+    with invocation_lock:
+        return handle_invocation(event, context)
+
+def handle_invocation(event, context):
+    """Serve one invocation; lambda_handler holds invocation_lock around it"""
+    request = RequestContext(event)
+    request_log.start(
+        request.method,
+        request.path,
+        request.source_ip,
+        request.user_agent,
+        getattr(context, 'aws_request_id', None)
+    )
+    # Full event dumps are expensive under bot load, so only emit them in debug mode
+    request_log.debug('Event', event=event)
+    
+    result = None
+    try:
+        if not request.method and is_warmup_event(event):
+            request_log.set_route('warmup')
+            result = handle_warmup(request)
+        else:
+            result = route_event(request)
+        return result
+    finally:
+        if write_queue is None or not write_queue.extension_active:
+            flush_counter_writes()
+        if write_queue is not None:
+            write_queue.invocation_done()
+        request_log.finish(result.get('statusCode', 200) if result else 500)
+
 # For backwards compatibility, also export as 'handler'
 handler = lambda_handler
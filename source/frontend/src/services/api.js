@@ -50,8 +50,9 @@ const api = {
   },
   
   // Bot Demo 2 - Silent discard
-  getBotDemo2Comments() {
-    return apiClient.get('/bot-demo-2/comments')
+  // Optional params: { limit, cursor } - pass the previous response's nextCursor to load the next page
+  getBotDemo2Comments(params) {
+    return apiClient.get('/bot-demo-2/comments', { params })
   },
   
   postBotDemo2Comment(commentData) {
@@ -4,9 +4,14 @@ async function handler(event) {
     var request = event.request;
     var headers = request.headers;
     
-    // Check if bot is detected by WAF
+    // Check if bot is detected by WAF. WAF inserts a secret value, so a copy of the header
+    // sent by the client never matches; drop it, and the un-prefixed form WAF never sends
     var isBotDetected = headers['x-amzn-waf-targeted-bot-detected'] && 
-                       headers['x-amzn-waf-targeted-bot-detected'].value === 'true';
+                       headers['x-amzn-waf-targeted-bot-detected'].value === '${waf_bot_header_value}';
+    if (!isBotDetected) {
+        delete headers['x-amzn-waf-targeted-bot-detected'];
+    }
+    delete headers['targeted-bot-detected'];
     
     // Check if this is a request for bot-demo-1
     var isBotDemo1 = request.uri === '/bot-demo-1' || request.uri.startsWith('/bot-demo-1/');
@@ -53,6 +53,11 @@ resource "random_id" "cloudfront_function_suffix" {
   byte_length = 4
 }
 
+# Secret value WAF inserts for targeted bots, so clients cannot forge the header
+resource "random_id" "waf_bot_header_value" {
+  byte_length = 16
+}
+
 # =============================================================================
 # VPC AND NETWORKING
 # =============================================================================
@@ -449,10 +454,19 @@ resource "aws_dynamodb_table" "comments" {
     type = "N"
   }
 
+  attribute {
+    name = "feed_bucket"
+    type = "S"
+  }
+
+  # Newest-first comment feed: bucketed partition key with a timestamp sort key.
+  # Only the attributes the frontend renders are projected to keep index reads small.
   global_secondary_index {
-    name               = "timestamp-index"
-    hash_key           = "timestamp"
-    projection_type    = "ALL"
+    name               = "feed-index"
+    hash_key           = "feed_bucket"
+    range_key          = "timestamp"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["n", "c", "r", "sd", "name", "comment", "rating", "silent_discard"]
   }
 
   tags = merge(local.common_tags, {
@@ -467,6 +481,29 @@ resource "aws_dynamodb_table" "comments" {
   }
 }
 
+# Fleet-wide per-client request counters, one item per client and rate window.
+# The API Lambda flushes pre-aggregated hits with UpdateItem ADD; items expire via TTL.
+# Sticky bot/suspect verdicts share the table as 'verdict#<fingerprint>' items.
+resource "aws_dynamodb_table" "client_counters" {
+  name         = "${local.name_prefix}-client-counters"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "id"
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = merge(local.common_tags, {
+    Name = "Bot Deception Client Counters Table"
+  })
+}
+
 
 
 # =============================================================================
@@ -514,6 +551,7 @@ resource "aws_iam_role_policy" "lambda_api" {
         Action = [
           "dynamodb:GetItem",
           "dynamodb:PutItem",
+          "dynamodb:BatchWriteItem",
           "dynamodb:UpdateItem",
           "dynamodb:DeleteItem",
           "dynamodb:Query",
@@ -521,7 +559,8 @@ resource "aws_iam_role_policy" "lambda_api" {
         ]
         Resource = [
           aws_dynamodb_table.comments.arn,
-          "${aws_dynamodb_table.comments.arn}/index/*"
+          "${aws_dynamodb_table.comments.arn}/index/*",
+          aws_dynamodb_table.client_counters.arn
         ]
       }
     ]
@@ -564,7 +603,9 @@ resource "aws_lambda_function" "api" {
 
   environment {
     variables = {
-      DYNAMODB_TABLE_NAME = aws_dynamodb_table.comments.name
+      DYNAMODB_TABLE_NAME  = aws_dynamodb_table.comments.name
+      COUNTER_TABLE_NAME   = aws_dynamodb_table.client_counters.name
+      WAF_BOT_HEADER_VALUE = random_id.waf_bot_header_value.hex
       # Python-specific optimizations
       PYTHONPATH = "/var/runtime"
     }
@@ -615,6 +656,31 @@ resource "aws_cloudwatch_log_group" "lambda_api" {
   tags              = local.common_tags
 }
 
+# Scheduled warm-up pings: pre-touch the DynamoDB client and caches between bursts
+resource "aws_cloudwatch_event_rule" "lambda_api_warmup" {
+  count               = var.lambda_warmup_schedule != "" ? 1 : 0
+  name                = "${local.name_prefix}-api-warmup"
+  description         = "Keep the API Lambda warm"
+  schedule_expression = var.lambda_warmup_schedule
+  tags                = local.common_tags
+}
+
+resource "aws_cloudwatch_event_target" "lambda_api_warmup" {
+  count = var.lambda_warmup_schedule != "" ? 1 : 0
+  rule  = aws_cloudwatch_event_rule.lambda_api_warmup[0].name
+  arn   = aws_lambda_function.api.arn
+  input = jsonencode({ warmup = true })
+}
+
+resource "aws_lambda_permission" "warmup_invoke" {
+  count         = var.lambda_warmup_schedule != "" ? 1 : 0
+  statement_id  = "AllowExecutionFromEventBridgeWarmup"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.api.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.lambda_api_warmup[0].arn
+}
+
 resource "aws_cloudwatch_log_group" "lambda_fake_page_generator" {
   name              = "/aws/lambda/${aws_lambda_function.fake_page_generator.function_name}"
   retention_in_days = var.log_retention_days
@@ -1174,7 +1240,7 @@ resource "aws_wafv2_web_acl" "main" {
         custom_request_handling {
           insert_header {
             name  = "targeted-bot-detected"
-            value = "true"
+            value = random_id.waf_bot_header_value.hex
           }
         }
       }
@@ -1672,6 +1738,7 @@ resource "aws_cloudfront_function" "bot_redirect" {
   publish = true
   code    = templatefile("${path.module}/cloudfront-function.js", {
     timeout_alb_dns_name = aws_lb.timeout.dns_name
+    waf_bot_header_value = random_id.waf_bot_header_value.hex
   })
 }
 
@@ -1823,6 +1890,12 @@ resource "aws_cloudfront_distribution" "main" {
     default_ttl = 0
     max_ttl     = 0
 
+    # Overwrites x-bot-detected and drops forged WAF headers before they reach the API
+    function_association {
+      event_type   = "viewer-request"
+      function_arn = aws_cloudfront_function.bot_redirect.arn
+    }
+
     # Enable real-time logging
     realtime_log_config_arn = aws_cloudfront_realtime_log_config.main.arn
   }
@@ -104,6 +104,12 @@ variable "lambda_memory_size" {
   }
 }
 
+variable "lambda_warmup_schedule" {
+  description = "EventBridge schedule expression for API Lambda warm-up pings, e.g. rate(5 minutes) (empty disables)"
+  type        = string
+  default     = ""
+}
+
 variable "cloudfront_price_class" {
   description = "CloudFront distribution price class"
   type        = string
@@ -0,0 +1,34 @@
+"""Fixtures for the API Lambda tests: import it offline, then isolate per-test state"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'source', 'backend'))
+
+# Configuration is read at import time; keep everything in-process and quiet
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('WRITE_BEHIND', 'false')
+os.environ.setdefault('LOG_SAMPLE_RATES', 'human=0,bot=0,none=0')
+os.environ.setdefault('VERDICT_TABLE_NAME', '')
+os.environ.setdefault('COUNTER_TABLE_NAME', '')
+
+import api_lambda  # noqa: E402
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """api_lambda with a fresh store, verdict cache, submission window and feed version"""
+    monkeypatch.setattr(api_lambda, 'db', api_lambda.MemoryStore())
+    monkeypatch.setattr(api_lambda, 'verdict_cache', api_lambda.VerdictCache(
+        '', api_lambda.VERDICT_CACHE_TTL, api_lambda.VERDICT_CACHE_NEGATIVE_TTL,
+        api_lambda.VERDICT_CACHE_MAX_ENTRIES, api_lambda.VERDICT_CACHE_FLUSH_INTERVAL,
+        api_lambda.VERDICT_CACHE_MAX_WRITES
+    ))
+    monkeypatch.setattr(api_lambda, 'submission_tracker', api_lambda.SlidingWindowCounter(
+        api_lambda.SUBMISSION_RATE_WINDOW, api_lambda.SUBMISSION_RATE_SLOTS, api_lambda.SUBMISSION_TRACKER_MAX_KEYS
+    ))
+    monkeypatch.setattr(api_lambda, 'feed_version', api_lambda.FeedVersion('', api_lambda.COMMENT_CACHE_TTL))
+    return api_lambda
+
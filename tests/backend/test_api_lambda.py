@@ -0,0 +1,252 @@
+"""Regression tests for the batch endpoint, sticky verdicts, comment ETags and feed pagination"""
+
+import json
+
+import pytest
+
+BATCH_PATH = '/api/comments/batch'
+CLIENT_IP = '203.0.113.7'
+
+HUMAN_HEADERS = {
+    'user-agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0',
+    'accept': 'application/json',
+    'accept-language': 'en-US,en;q=0.9',
+    'sec-fetch-mode': 'cors',
+    'x-forwarded-for': f'{CLIENT_IP}, 10.0.0.1'
+}
+SCRIPT_HEADERS = {
+    'user-agent': 'python-requests/2.31.0',
+    'accept': '*/*',
+    'x-forwarded-for': '198.51.100.23, 10.0.0.1'
+}
+
+
+def alb_event(method, path, headers, body=None):
+    """ALB-style event, the shape the load harness and benches send"""
+    event = {'httpMethod': method, 'path': path, 'headers': dict(headers)}
+    if body is not None:
+        event['body'] = json.dumps(body)
+    return event
+
+
+def invoke(api, event):
+    """Run the handler and return (status, headers, parsed body)"""
+    response = api.lambda_handler(event, None)
+    body = response.get('body')
+    return response['statusCode'], response.get('headers') or {}, json.loads(body) if body else None
+
+
+def batch_body(count, prefix='batch'):
+    return {'comments': [{'commenter': f'{prefix} {index}', 'details': f'comment {index}'} for index in range(count)]}
+
+
+def stored_ids(api):
+    return [item['id'] for item in api.db.get_page(api.BATCH_MAX_COMMENTS)[0]]
+
+
+class TestBatchAuthorization:
+    @pytest.fixture(autouse=True)
+    def admin_token(self, monkeypatch, api):
+        monkeypatch.setattr(api, 'BATCH_ADMIN_TOKEN', 'test-admin-token')
+
+    def test_admin_token_is_checked_before_bot_scoring(self, api):
+        headers = {**SCRIPT_HEADERS, 'x-admin-token': 'test-admin-token'}
+        status, _, body = invoke(api, alb_event('POST', BATCH_PATH, headers, batch_body(3)))
+        assert status == 201
+        assert body['stored'] == 3
+        assert not any(result['id'].startswith('fake_') for result in body['results'])
+        assert sorted(stored_ids(api)) == sorted(result['id'] for result in body['results'])
+        assert api.request_log.verdict == 'human'
+
+    def test_admin_imports_skip_the_submission_rate(self, api):
+        headers = {**HUMAN_HEADERS, 'x-admin-token': 'test-admin-token'}
+        batches = api.SUBMISSION_RATE_LIMIT + 2
+        for index in range(batches):
+            status, _, body = invoke(api, alb_event('POST', BATCH_PATH, headers, batch_body(2, f'import {index}')))
+            assert status == 201
+            assert body['stored'] == 2
+        assert len(stored_ids(api)) == batches * 2
+        assert not api.verdict_cache.local.get(api.client_fingerprint(HUMAN_HEADERS, CLIENT_IP))
+
+    def test_unauthenticated_bot_is_shadow_banned(self, api):
+        status, _, body = invoke(api, alb_event('POST', BATCH_PATH, SCRIPT_HEADERS, batch_body(4)))
+        assert status == 201
+        assert body['stored'] == 4
+        assert all(result['id'].startswith('fake_') for result in body['results'])
+        assert stored_ids(api) == []
+
+    def test_wrong_token_from_a_bot_is_shadow_banned(self, api):
+        headers = {**SCRIPT_HEADERS, 'x-admin-token': 'guess'}
+        status, _, body = invoke(api, alb_event('POST', BATCH_PATH, headers, batch_body(2)))
+        assert status == 201
+        assert all(result['id'].startswith('fake_') for result in body['results'])
+        assert stored_ids(api) == []
+
+    def test_unauthenticated_human_gets_not_found(self, api):
+        status, _, body = invoke(api, alb_event('POST', BATCH_PATH, HUMAN_HEADERS, batch_body(2)))
+        assert status == 404
+        assert body['error'] == 'Not Found'
+        assert 'availableRoutes' in body
+        assert stored_ids(api) == []
+
+    def test_unset_token_closes_the_endpoint(self, monkeypatch, api):
+        monkeypatch.setattr(api, 'BATCH_ADMIN_TOKEN', '')
+        headers = {**HUMAN_HEADERS, 'x-admin-token': ''}
+        status, _, _ = invoke(api, alb_event('POST', BATCH_PATH, headers, batch_body(2)))
+        assert status == 404
+        assert stored_ids(api) == []
+
+
+class TestStickyWafVerdict:
+    @pytest.fixture(autouse=True)
+    def waf_secret(self, monkeypatch, api):
+        monkeypatch.setattr(api, 'WAF_BOT_HEADER_VALUE', 'waf-secret')
+
+    def test_waf_verdict_sticks_to_the_fingerprint(self, api):
+        flagged = {**HUMAN_HEADERS, 'x-amzn-waf-targeted-bot-detected': 'waf-secret'}
+        assert api.classify_request(flagged, CLIENT_IP) == 'bot'
+        # The next request from the same client no longer carries the WAF header
+        assert api.classify_request(HUMAN_HEADERS, CLIENT_IP) == 'bot'
+        assert api.request_log.verdict == 'bot'
+
+    def test_sticky_verdict_covers_the_handler(self, api):
+        flagged = {**HUMAN_HEADERS, 'x-amzn-waf-targeted-bot-detected': 'waf-secret'}
+        invoke(api, alb_event('GET', '/api/comments', flagged))
+        status, headers, body = invoke(api, alb_event('GET', '/api/comments', HUMAN_HEADERS))
+        assert status == 200
+        assert 'ETag' not in headers
+        assert body['total'] == min(api.DECOY_COMMENTS_PER_RESPONSE, len(api.get_decoy_pool()))
+
+    @pytest.mark.parametrize('header', ['x-amzn-waf-targeted-bot-detected', 'targeted-bot-detected'])
+    def test_forged_waf_header_is_ignored(self, api, header):
+        forged = {**HUMAN_HEADERS, header: 'true'}
+        assert api.classify_request(forged, CLIENT_IP) == 'human'
+        assert api.verdict_cache.get(api.client_fingerprint(forged, CLIENT_IP), fetch=False) is None
+        assert api.classify_request(HUMAN_HEADERS, CLIENT_IP) == 'human'
+
+
+class FakeVersionTable:
+    """Feed version item shared by every container, bumped here by the test"""
+
+    def __init__(self, version):
+        self.version = version
+
+    def get_item(self, Key):
+        return {'Item': {'id': Key['id'], 'version': self.version}}
+
+    def update_item(self, Key, ExpressionAttributeValues, **kwargs):
+        self.version += ExpressionAttributeValues[':count']
+        return {'Attributes': {'version': self.version}}
+
+
+class TestCommentETags:
+    @pytest.fixture
+    def version_table(self, monkeypatch, api):
+        api.db.put_items([{'id': 'c1', 'timestamp': 1000, 'commenter': 'Ann', 'details': 'first'}])
+        table = FakeVersionTable(5)
+        feed_version = api.FeedVersion('counters', 0)
+        feed_version.table = table
+        monkeypatch.setattr(api, 'feed_version', feed_version)
+        # Pages outlive version reads, which is when a stale page could pick up a new tag
+        api.db.read_cache = api.TTLCache(60, 100)
+        return table
+
+    def get_comments(self, api, if_none_match=None):
+        headers = {**HUMAN_HEADERS, 'if-none-match': if_none_match} if if_none_match else HUMAN_HEADERS
+        return invoke(api, alb_event('GET', '/api/comments', headers))
+
+    def test_tag_follows_the_feed_version(self, api, version_table):
+        status, headers, _ = self.get_comments(api)
+        assert status == 200
+        assert headers['ETag'].startswith('"c5-')
+        status, _, body = self.get_comments(api, headers['ETag'])
+        assert status == 304
+        assert body is None
+
+    def test_write_from_another_container_is_not_served_under_the_new_tag(self, api, version_table):
+        _, old_headers, old_body = self.get_comments(api)
+        assert [comment['id'] for comment in old_body['comments']] == ['c1']
+
+        # Another container stores a comment and bumps the shared version; this
+        # container's page cache is not invalidated
+        api.db._put(api.db._stored({'id': 'c2', 'timestamp': 2000, 'commenter': 'Bo', 'details': 'second'}))
+        version_table.version = 6
+
+        status, headers, body = self.get_comments(api)
+        assert status == 200
+        assert headers['ETag'].startswith('"c6-')
+        assert [comment['id'] for comment in body['comments']] == ['c2', 'c1']
+
+        status, _, body = self.get_comments(api, old_headers['ETag'])
+        assert status == 200
+        assert [comment['id'] for comment in body['comments']] == ['c2', 'c1']
+        assert self.get_comments(api, headers['ETag'])[0] == 304
+
+    def test_own_write_moves_the_tag_on(self, api, version_table):
+        _, old_headers, _ = self.get_comments(api)
+        status, _, _ = invoke(api, alb_event('POST', '/api/comments', HUMAN_HEADERS, {'commenter': 'Cy', 'details': 'hello there'}))
+        assert status == 201
+        # The bump is added to the shared version when the invocation ends
+        assert api.feed_version.pending == 0
+        assert version_table.version == 6
+
+        status, headers, body = self.get_comments(api, old_headers['ETag'])
+        assert status == 200
+        assert headers['ETag'].startswith('"c6-')
+        assert body['comments'][0]['name'] == 'Cy'
+        assert [comment['id'] for comment in body['comments']][1:] == ['c1']
+
+    def test_no_tag_while_bumps_are_pending(self, api, version_table):
+        api.feed_version.bump()
+        status, headers, body = self.get_comments(api)
+        assert status == 200
+        assert 'ETag' not in headers
+        assert body['total'] == 1
+
+def walk_feed(store, limit):
+    """Page through the whole feed, returning the ids in order and the page count"""
+    ids, pages, cursor = [], 0, None
+    while True:
+        items, cursor = store.get_page(limit, cursor)
+        ids.extend(item['id'] for item in items)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+
+class TestPaginationParity:
+    @pytest.fixture
+    def stores(self, monkeypatch, tmp_path, api):
+        monkeypatch.setattr(api, 'FEED_BUCKET_COUNT', 3)
+        # Repeated timestamps exercise the id tie-break on both sides of a cursor
+        items = [
+            {'id': f'comment-{index:03d}', 'timestamp': 1_700_000_000_000 + (index // 4) * 1000, 'commenter': 'Ann', 'details': str(index)}
+            for index in range(47)
+        ]
+        stores = [api.MemoryStore(), api.SQLiteStore(str(tmp_path / 'comments.sqlite3'))]
+        for store in stores:
+            assert all(store.put_items(items))
+        return items, stores
+
+    @pytest.mark.parametrize('limit', [1, 5, 7, 50])
+    def test_memory_and_sqlite_pages_match(self, stores, limit):
+        items, (memory, sqlite) = stores
+        memory_ids, memory_pages = walk_feed(memory, limit)
+        sqlite_ids, sqlite_pages = walk_feed(sqlite, limit)
+        assert memory_ids == sqlite_ids
+        assert memory_pages == sqlite_pages
+        # Every item exactly once, newest first
+        assert sorted(memory_ids) == sorted(item['id'] for item in items)
+        timestamps = {item['id']: item['timestamp'] for item in items}
+        assert [timestamps[item_id] for item_id in memory_ids] == sorted(timestamps.values(), reverse=True)
+
+    def test_cursors_are_interchangeable(self, stores):
+        _, (memory, sqlite) = stores
+        _, cursor = memory.get_page(6)
+        assert memory.get_page(6, cursor) == sqlite.get_page(6, cursor)
+
+    def test_malformed_cursor_is_rejected(self, stores):
+        _, (memory, sqlite) = stores
+        for store in (memory, sqlite):
+            with pytest.raises(ValueError):
+                store.get_page(5, 'not-a-cursor')